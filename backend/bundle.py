@@ -0,0 +1,234 @@
+"""Compiled playlists: every frame of a playlist in one memory-mapped file.
+
+The server compiles the image folder, in display order, into a bundle
+whenever it changes the playlist (and can save snapshots under other
+names). The viewer maps the bundle and plays frames straight out of it, so
+playback needs no Image.open, directory listing or order.json read; a
+reload swaps the whole mapping at once.
+
+Layout (little-endian, sections 64-byte aligned):
+
+    header   b"LEDB", u16 version, u16 width, u16 height, u16 flags,
+             u32 entry count, u64 index offset, u64 names offset,
+             i64 folder mtime_ns, i64 order.json mtime_ns (0 if none)
+    frames   per entry: RGB24 pixels (still) or uint8 palette indices,
+             256-entry RGB palettes and int32 durations (animation, as in
+             frame_cache.Animation; with 0 palettes the frames are RGB24)
+    index    one 56-byte record per entry, in display order:
+             u32 name offset, u16 name length, u8 kind, pad, u32 frames,
+             u32 palettes, i64 source mtime_ns, u64 source size,
+             u64 pixels/indices offset, u64 palettes offset,
+             u64 durations offset
+    names    UTF-8 file names, referenced from the index
+
+An entry whose frames could not be compiled (unreadable, or an animation
+over the size budget) is EXTERNAL: it keeps its place in the playlist and
+the viewer loads it from the image folder as before.
+
+A bundle of the image folder records the folder's and order.json's mtimes
+and each source's mtime and size, so a reader can tell a file was added,
+removed, reordered or replaced in place since it was compiled; a SNAPSHOT
+bundle is self-contained and never goes stale.
+"""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+import frame_cache
+
+MAGIC = b"LEDB"
+VERSION = 1
+STILL, ANIMATION, EXTERNAL = 0, 1, 2
+FLAG_SNAPSHOT = 0x01
+
+_HEADER = struct.Struct("<4sHHHHIQQqq")
+_HEADER_SIZE = 64
+_ENTRY = struct.Struct("<IHBxIIqQQQQ")
+_ALIGN = 64
+
+# Animations whose palette-indexed frames exceed this are left EXTERNAL
+# (streamed from the source file as before)
+BUNDLE_GIF_MAX_BYTES = 4 * 1024 * 1024
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _frames(path, target_size, gif_budget):
+    """(pixels, durations) for path from the frame cache or a fresh decode, or None."""
+    cached = frame_cache.load(path, target_size)
+    if cached is not None:
+        return cached
+    try:
+        result = frame_cache.decode_image(path, target_size, gif_budget)
+    except frame_cache.OverBudget:
+        return None
+    if result is not None:
+        frame_cache.store(path, target_size, *result)
+    return result
+
+
+def compile_bundle(paths, target_size, dest, folder=None, order_file=None,
+                   gif_budget=BUNDLE_GIF_MAX_BYTES):
+    """
+    Write the frames of paths, in order, to a bundle at dest (atomically).
+    With folder (and order_file), the bundle tracks that folder for
+    staleness; without, it is a snapshot. Returns the number of entries
+    with frames in the bundle.
+    """
+    # Create directories inside folder before reading its mtime
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        os.makedirs(frame_cache.FRAME_CACHE_DIR, exist_ok=True)
+    except OSError:
+        pass
+    folder_mtime = _mtime_ns(folder) if folder else 0
+    order_mtime = _mtime_ns(order_file) if folder and order_file else 0
+    flags = 0 if folder else FLAG_SNAPSHOT
+
+    def align(f):
+        pad = -f.tell() % _ALIGN
+        f.write(b"\0" * pad)
+        return f.tell()
+
+    def put(f, arr):
+        offset = align(f)
+        # A byte view, which (unlike memoryview.cast) also works for the empty
+        # palettes of an RGB animation
+        f.write(np.ascontiguousarray(arr).reshape(-1).view(np.uint8))
+        return offset
+
+    entries = []
+    names = bytearray()
+    compiled = 0
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(b"\0" * _HEADER_SIZE)
+            for path in paths:
+                name = os.path.basename(path).encode("utf-8")
+                # A source that can't be stat'ed is recorded as (0, 0)
+                sig, result = (0, 0), None
+                try:
+                    st = os.stat(path)
+                    sig = (st.st_mtime_ns, st.st_size)
+                    result = _frames(path, target_size, gif_budget)
+                except Exception as e:
+                    print(f"Bundle: leaving {path} external: {e}")
+
+                kind, frames, palettes, data, pal, dur = EXTERNAL, 0, 0, 0, 0, 0
+                if result is not None:
+                    pixels, durations = result
+                    if durations is None:
+                        kind, frames = STILL, 1
+                        data = put(f, np.asarray(pixels, dtype=np.uint8))
+                    else:
+                        kind, frames, palettes = ANIMATION, len(pixels.indices), len(pixels.palettes)
+                        data = put(f, pixels.indices)
+                        pal = put(f, pixels.palettes)
+                        dur = put(f, np.asarray(durations, dtype="<i4"))
+                    compiled += 1
+                entries.append(_ENTRY.pack(len(names), len(name), kind, frames, palettes,
+                                           sig[0], sig[1], data, pal, dur))
+                names += name
+
+            index_offset = align(f)
+            for entry in entries:
+                f.write(entry)
+            names_offset = f.tell()
+            f.write(names)
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, target_size[0], target_size[1], flags,
+                                 len(entries), index_offset, names_offset,
+                                 folder_mtime, order_mtime))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return compiled
+
+
+class Bundle:
+    """A mapped bundle. Frames returned by load() are views into the mapping."""
+
+    def __init__(self, path, folder):
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, width, height, flags, count, index_offset, names_offset,
+         self.folder_mtime_ns, self.order_mtime_ns) = _HEADER.unpack_from(self._buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} playlist bundle")
+        self.path = path
+        self.size = (width, height)
+        self.snapshot = bool(flags & FLAG_SNAPSHOT)
+        self._entries = []
+        self.paths = []
+        for i in range(count):
+            entry = _ENTRY.unpack_from(self._buf, index_offset + i * _ENTRY.size)
+            name_offset, name_len = entry[0], entry[1]
+            start = names_offset + name_offset
+            name = self._buf[start:start + name_len].decode("utf-8")
+            self.paths.append(os.path.join(folder, name))
+            self._entries.append(entry[2:])
+        self._index = {p: i for i, p in enumerate(self.paths)}
+
+    def is_current(self, folder, order_file):
+        """
+        False if files were added, removed, reordered or replaced in folder
+        since compiling. Costs a stat per entry.
+        """
+        if self.snapshot:
+            return True
+        if (_mtime_ns(folder) != self.folder_mtime_ns
+                or _mtime_ns(order_file) != self.order_mtime_ns):
+            return False
+        # Overwriting a file keeps the folder's mtime
+        for path, entry in zip(self.paths, self._entries):
+            try:
+                st = os.stat(path)
+                sig = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                sig = (0, 0)
+            if sig != (entry[3], entry[4]):
+                return False
+        return True
+
+    def signatures(self):
+        """{path: (mtime_ns, size)} of the sources as compiled."""
+        return {p: (e[3], e[4]) for p, e in zip(self.paths, self._entries)}
+
+    def __contains__(self, path):
+        i = self._index.get(path)
+        return i is not None and self._entries[i][0] != EXTERNAL
+
+    def _array(self, offset, dtype, shape):
+        count = int(np.prod(shape))
+        return np.frombuffer(self._buf, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+    def load(self, path):
+        """(pixels, durations) for path, like frame_cache.load(); None if not in the bundle."""
+        i = self._index.get(path)
+        if i is None:
+            return None
+        kind, frames, palettes, _, _, data, pal, dur = self._entries[i]
+        w, h = self.size
+        if kind == STILL:
+            return self._array(data, np.uint8, (h, w, 3)), None
+        if kind == ANIMATION:
+            durations = self._array(dur, "<i4", (frames,)).tolist()
+            shape = (frames, h, w) if palettes else (frames, h, w, 3)
+            anim = frame_cache.Animation(self._array(data, np.uint8, shape),
+                                         self._array(pal, np.uint8, (palettes, 256, 3)),
+                                         durations)
+            return anim, durations
+        return None
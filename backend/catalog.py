@@ -0,0 +1,307 @@
+"""Index of the image folder shared by the server and the viewer.
+
+One SQLite database (CATALOG_FILE) holds a row per image: file name,
+content hash, dimensions, frame count, frame durations, mtime, size and
+position in the display order. Listings, order lookups and
+case-insensitive name matches are indexed queries instead of directory
+scans and order.json reads.
+
+The folder itself stays the source of truth. The catalog records the
+folder's and order.json's mtimes and re-syncs from a directory scan when
+either changes, so a read costs two stats unless something was added,
+removed or reordered (by the server or by hand). The server also forces a
+sync after each of its writes, which catches files replaced in place.
+
+A sync only lists and stats files, so it is as cheap as the scan it
+replaces and holds the write lock briefly. The expensive columns (hash,
+dimensions, frames, durations) of new or changed files start out NULL and
+are filled in by describe_pending(), outside any transaction. With
+describe=True a background thread does that whenever rows without metadata
+exist, at startup and on reads, whichever process synced them.
+
+Every change bumps a version number; etag() combines it with a random
+per-database epoch for HTTP caching.
+
+If the database can't be opened (e.g. a read-only file system) every
+method falls back to scanning the folder.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+from PIL import Image
+
+from config import CATALOG_FILE, IMAGE_EXTENSIONS, IMAGE_FOLDER, ORDER_FILE, get_sorted_image_paths
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    filename  TEXT PRIMARY KEY,
+    sha1      TEXT,
+    width     INTEGER,
+    height    INTEGER,
+    frames    INTEGER,
+    durations TEXT,
+    mtime_ns  INTEGER,
+    size      INTEGER,
+    position  INTEGER
+);
+CREATE INDEX IF NOT EXISTS images_nocase ON images (filename COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS images_order ON images (position IS NULL, position, filename);
+CREATE INDEX IF NOT EXISTS images_pending ON images (filename) WHERE sha1 IS NULL;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_ORDERED = "SELECT {} FROM images ORDER BY position IS NULL, position, filename"
+
+# Column order of describe()
+FIELDS = ("filename", "sha1", "width", "height", "frames", "durations", "mtime_ns", "size", "position")
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _describe_file(path):
+    """Catalog columns (sha1, width, height, frames, durations JSON) for an image file."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    width = height = None
+    frames, durations = 1, None
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            frames = getattr(img, "n_frames", 1)
+            if frames > 1:
+                durations = []
+                for i in range(frames):
+                    img.seek(i)
+                    durations.append(img.info.get("duration", 100))
+    except Exception:
+        pass  # listed anyway; the viewer skips files it can't decode
+    return h.hexdigest(), width, height, frames, json.dumps(durations) if durations else None
+
+
+class Catalog:
+    """The catalog at path, indexing folder. Safe to share between threads."""
+
+    def __init__(self, path=CATALOG_FILE, folder=IMAGE_FOLDER, order_file=ORDER_FILE, describe=False):
+        self.path = path
+        self.folder = folder
+        self.order_file = order_file
+        self.describe_in_background = describe
+        self._local = threading.local()
+        self._describing = threading.Lock()
+        self.available = True
+        try:
+            conn = self._conn()
+            conn.executescript(_SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', '0')")
+        except sqlite3.Error as e:
+            print(f"Image catalog unavailable ({e}); scanning {folder} instead")
+            self.available = False
+            return
+        self.refresh()
+
+    def _conn(self):
+        """One connection per thread, in autocommit mode (transactions are explicit)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # =========================================================================
+    # Sync from the folder
+    # =========================================================================
+
+    def _stamp(self):
+        return f"{_mtime_ns(self.folder)}:{_mtime_ns(self.order_file)}"
+
+    def refresh(self, force=False):
+        """Re-sync from the folder if it or order.json changed (always with force)."""
+        if not self.available:
+            return
+        stamp = self._stamp()
+        conn = self._conn()
+        if not force and self._meta(conn, "stamp") == stamp:
+            self._describe_in_background()
+            return
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            # Locked for longer than the timeout: serve the last sync
+            print(f"Image catalog not refreshed: {e}")
+            return
+        try:
+            # Another process may have synced while we waited for the lock
+            if force or self._meta(conn, "stamp") != stamp:
+                if self._sync(conn):
+                    self._bump(conn)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('stamp', ?)", (stamp,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._describe_in_background()
+
+    def _describe_in_background(self):
+        """Start describe_pending() on a thread if enabled and any row lacks metadata."""
+        if not self.describe_in_background or self._describing.locked():
+            return
+        # Rows may have been synced by a process that doesn't describe (the viewer)
+        if self._conn().execute("SELECT 1 FROM images WHERE sha1 IS NULL LIMIT 1").fetchone():
+            threading.Thread(target=self.describe_pending, daemon=True).start()
+
+    def _bump(self, conn):
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+    def _sync(self, conn):
+        """Bring the rows in line with the folder. Returns True if anything changed."""
+        try:
+            names = [f for f in os.listdir(self.folder) if f.lower().endswith(IMAGE_EXTENSIONS)]
+        except OSError:
+            names = []
+        known = {row[0]: (row[1], row[2])
+                 for row in conn.execute("SELECT filename, mtime_ns, size FROM images")}
+        changed = False
+
+        gone = set(known) - set(names)
+        if gone:
+            conn.executemany("DELETE FROM images WHERE filename = ?", [(n,) for n in gone])
+            changed = True
+
+        for name in names:
+            try:
+                signature = _signature(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            if known.get(name) == signature:
+                continue
+            # Metadata is filled in later by describe_pending()
+            conn.execute("INSERT OR REPLACE INTO images (filename, mtime_ns, size) VALUES (?, ?, ?)",
+                         (name,) + signature)
+            changed = True
+
+        try:
+            with open(self.order_file) as f:
+                order = json.load(f)
+        except (OSError, ValueError):
+            order = []
+        positions = {name: i for i, name in enumerate(order)}
+        current = dict(conn.execute("SELECT filename, position FROM images"))
+        updates = [(positions.get(name), name) for name, pos in current.items()
+                   if positions.get(name) != pos]
+        if updates:
+            conn.executemany("UPDATE images SET position = ? WHERE filename = ?", updates)
+            changed = True
+        return changed
+
+    def describe_pending(self):
+        """
+        Fill in the metadata of rows that have none yet. Files are read
+        outside any transaction; a result is dropped if the file no longer
+        matches its row. Returns the number of rows described.
+        """
+        if not self.available or not self._describing.acquire(blocking=False):
+            return 0
+        try:
+            conn = self._conn()
+            rows = conn.execute("SELECT filename, mtime_ns, size FROM images WHERE sha1 IS NULL").fetchall()
+            described = 0
+            for name, mtime_ns, size in rows:
+                path = os.path.join(self.folder, name)
+                try:
+                    # Skip files changed since the sync or while being read;
+                    # the next sync picks them up
+                    if _signature(path) != (mtime_ns, size):
+                        continue
+                    columns = _describe_file(path)
+                    if _signature(path) != (mtime_ns, size):
+                        continue
+                except OSError:
+                    continue
+                cur = conn.execute(
+                    "UPDATE images SET sha1 = ?, width = ?, height = ?, frames = ?, durations = ?"
+                    " WHERE filename = ? AND mtime_ns = ? AND size = ?",
+                    columns + (name, mtime_ns, size))
+                described += cur.rowcount
+            if described:
+                self._bump(conn)
+            return described
+        except sqlite3.Error as e:
+            print(f"Image catalog: describing files failed: {e}")
+            return 0
+        finally:
+            self._describing.release()
+
+    # =========================================================================
+    # Queries
+    # =========================================================================
+
+    def filenames(self):
+        """Image file names in display order."""
+        if not self.available:
+            return [os.path.basename(p) for p in get_sorted_image_paths(self.folder, self.order_file)]
+        self.refresh()
+        return [row[0] for row in self._conn().execute(_ORDERED.format("filename"))]
+
+    def paths(self):
+        return [os.path.join(self.folder, name) for name in self.filenames()]
+
+    def describe(self):
+        """All rows in display order, as dicts; metadata not filled in yet is None."""
+        if not self.available:
+            return [{"filename": name} for name in self.filenames()]
+        self.refresh()
+        rows = self._conn().execute(_ORDERED.format(", ".join(FIELDS))).fetchall()
+        result = []
+        for row in rows:
+            entry = dict(zip(FIELDS, row))
+            entry["durations"] = json.loads(entry["durations"]) if entry["durations"] else None
+            result.append(entry)
+        return result
+
+    def find(self, name):
+        """The catalogued file name matching name case-insensitively, or None."""
+        if not self.available:
+            try:
+                return next((f for f in os.listdir(self.folder) if f.lower() == name.lower()), None)
+            except OSError:
+                return None
+        self.refresh()
+        row = self._conn().execute(
+            "SELECT filename FROM images WHERE filename = ? COLLATE NOCASE ORDER BY filename = ? DESC",
+            (name, name)).fetchone()
+        return row[0] if row else None
+
+    def etag(self):
+        """Opaque tag that changes whenever the listing or order changes, or None."""
+        if not self.available:
+            return None
+        self.refresh()
+        conn = self._conn()
+        return f"{self._meta(conn, 'epoch')}-{self._meta(conn, 'version')}"
@@ -1,5 +1,7 @@
 """Shared path and configuration logic for server and viewer."""
 
+import configparser
+import json
 import os
 
 # Project root is the parent of the backend/ directory
@@ -20,7 +22,125 @@ CONFIG_FILE = os.path.join(CONFIG_DIR, "config.ini")
 AUTH_FILE = os.path.join(CONFIG_DIR, ".auth")
 ORDER_FILE = os.path.join(IMAGE_FOLDER, "order.json")
 
-CTRL_SOCK = "/tmp/ledctl.sock"
+# File types the viewer plays
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+# Index of the image folder shared by server and viewer (see catalog.py)
+CATALOG_FILE = os.path.join(DATA_DIR, "catalog.db")
+
+# Pre-decoded matrix-resolution frames (see frame_cache.py)
+FRAME_CACHE_DIR = os.path.join(IMAGE_FOLDER, ".frames")
+
+# Where the viewer was in the playlist and the frame it was showing, so a
+# restart resumes there and shows that frame straight away
+VIEWER_STATE_FILE = os.path.join(CONFIG_DIR, "viewer_state.json")
+LAST_FRAME_FILE = os.path.join(CONFIG_DIR, "last_frame.npy")
+
+# Compiled playlists (see bundle.py). CURRENT_PLAYLIST is the image folder in
+# its display order, recompiled whenever the server changes it; other names
+# are saved snapshots
+BUNDLE_DIR = os.path.join(IMAGE_FOLDER, ".bundles")
+CURRENT_PLAYLIST = "current"
+
+# Panel layout and rgbmatrix options, overridable in the [matrix] section
+# of config.ini. Walls are chain_length panels per chain and parallel chains.
+MATRIX_DEFAULTS = {
+    "rows": 64,
+    "cols": 64,
+    "chain_length": 1,
+    "parallel": 1,
+    "hardware_mapping": "regular",
+    "pwm_bits": 8,
+    "pwm_lsb_nanoseconds": 130,
+    "gpio_slowdown": 2,
+}
+
+
+def load_matrix_geometry():
+    """Return MATRIX_DEFAULTS updated from config.ini's [matrix] section."""
+    geometry = dict(MATRIX_DEFAULTS)
+    config = configparser.ConfigParser()
+    try:
+        config.read(CONFIG_FILE)
+    except configparser.Error:
+        return geometry
+    if "matrix" not in config:
+        return geometry
+    for key, default in MATRIX_DEFAULTS.items():
+        if key not in config["matrix"]:
+            continue
+        value = config["matrix"][key].strip()
+        if isinstance(default, int):
+            try:
+                value = int(value)
+            except ValueError:
+                continue
+            if value < 1 and key not in ("pwm_lsb_nanoseconds", "gpio_slowdown"):
+                continue
+        geometry[key] = value
+    return geometry
+
+
+MATRIX_GEOMETRY = load_matrix_geometry()
+
+# Output size in pixels (width, height) of the whole wall
+MATRIX_SIZE = (
+    MATRIX_GEOMETRY["cols"] * MATRIX_GEOMETRY["chain_length"],
+    MATRIX_GEOMETRY["rows"] * MATRIX_GEOMETRY["parallel"],
+)
+
+CTRL_SOCK = os.environ.get("LED_CTRL_SOCK", "/tmp/ledctl.sock")
+
+# Live frame input (see live.py): datagram socket and shared-memory ring
+LIVE_SOCK = os.environ.get("LED_LIVE_SOCK", "/tmp/ledlive.sock")
+LIVE_RING = os.environ.get("LED_LIVE_RING", "/dev/shm/ledlive")
+
+# The viewer publishes every frame it shows here for the web preview (same
+# ring format as LIVE_RING)
+PREVIEW_RING = os.environ.get("LED_PREVIEW_RING", "/dev/shm/ledpreview")
+
+# The viewer's decoder process hands finished frames over in this directory
+# (see decoder.py); it should be on tmpfs
+DECODE_POOL_DIR = os.environ.get("LED_DECODE_POOL", "/dev/shm/leddecode")
+
+
+def load_order(order_file=ORDER_FILE):
+    """Load image order from order.json if it exists."""
+    if os.path.isfile(order_file):
+        try:
+            with open(order_file, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading order.json: {e}")
+    return None
+
+
+def get_sorted_image_paths(folder, order_file=ORDER_FILE):
+    """Return sorted list of image file paths without loading pixel data."""
+    if not os.path.isdir(folder):
+        return []
+
+    files = [f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+    if not files:
+        return []
+
+    order = load_order(order_file)
+    if order:
+        order_map = {name: idx for idx, name in enumerate(order)}
+        def sort_key(f):
+            if f in order_map:
+                return (0, order_map[f], f)
+            return (1, 0, f)
+        files = sorted(files, key=sort_key)
+    else:
+        files = sorted(files)
+
+    return [os.path.join(folder, f) for f in files]
+
+
+def bundle_path(name):
+    return os.path.join(BUNDLE_DIR, name + ".bundle")
 
 
 def ensure_directories():
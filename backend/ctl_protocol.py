@@ -0,0 +1,154 @@
+"""Request/response protocol on the viewer control socket (CTRL_SOCK).
+
+A request is one JSON datagram:
+
+    {"v": 1, "id": 7, "atomic": true,
+     "cmds": [{"cmd": "brightness", "value": 40}, {"cmd": "reload"}]}
+
+and the viewer answers the sender's address with
+
+    {"v": 1, "id": 7, "ok": true,
+     "results": [{"cmd": "brightness", "ok": true}, {"cmd": "reload", "ok": true}]}
+
+Commands run in order. With "atomic", every command is validated before
+any is applied and the batch is applied as one state change, so the render
+loop never sees half of it; one invalid command rejects the whole batch.
+Queries (e.g. {"cmd": "status"}) return their answer in the result's
+"value".
+
+The viewer still accepts the old plain-text datagrams ("on", "hold:30",
+...) so scripts that fire-and-forget keep working; those get no reply,
+except a plain "stats" or "status" which is answered with the bare JSON
+value.
+"""
+
+import itertools
+import json
+import socket
+import threading
+import time
+
+PROTOCOL_VERSION = 1
+
+# Largest datagram either side will read
+MAX_DATAGRAM = 65536
+
+
+class ProtocolError(ValueError):
+    def __init__(self, message, request_id=None):
+        super().__init__(message)
+        self.request_id = request_id
+
+
+def command(name, value=None):
+    """Build one command entry for a request."""
+    entry = {"cmd": name}
+    if value is not None:
+        entry["value"] = value
+    return entry
+
+
+def parse_legacy(text):
+    """Turn a plain-text datagram ("hold:30", "next") into a command entry."""
+    name, sep, value = text.strip().partition(":")
+    return command(name, value if sep else None)
+
+
+def decode_request(data):
+    """
+    Parse a datagram into (request_id, cmds, atomic, legacy). Legacy text
+    datagrams have request_id None and legacy True. Raises ProtocolError.
+    """
+    text = data.decode("utf-8").strip()
+    if not text.startswith("{"):
+        return None, [parse_legacy(text)], False, True
+    try:
+        msg = json.loads(text)
+    except ValueError as e:
+        raise ProtocolError(f"malformed request: {e}")
+    if not isinstance(msg, dict):
+        raise ProtocolError("request must be an object")
+    request_id = msg.get("id")
+    version = msg.get("v")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"unsupported protocol version {version!r} (expected {PROTOCOL_VERSION})",
+                            request_id)
+    cmds = msg.get("cmds")
+    if not isinstance(cmds, list) or not all(isinstance(c, dict) and "cmd" in c for c in cmds):
+        raise ProtocolError("cmds must be a list of {\"cmd\": ...} objects", request_id)
+    return request_id, cmds, bool(msg.get("atomic")), False
+
+
+def encode_response(request_id, results, error=None):
+    ok = error is None and all(r.get("ok") for r in results)
+    msg = {"v": PROTOCOL_VERSION, "id": request_id, "ok": ok, "results": results}
+    if error is not None:
+        msg["error"] = error
+    return json.dumps(msg).encode("utf-8")
+
+
+class ControlClient:
+    """
+    Persistent control-socket client. One request is in flight at a time;
+    replies are matched to requests by id, so a late reply to a request
+    that already timed out is discarded instead of answering the next one.
+    """
+
+    def __init__(self, path, timeout=2.0):
+        self.path = path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._sock = None
+
+    def _socket(self):
+        if self._sock is None:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            # Autobind to an abstract address so the viewer can reply
+            s.bind("")
+            self._sock = s
+        return self._sock
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def request(self, cmds, atomic=False, timeout=None):
+        """
+        Send a batch of commands and wait for the viewer's reply.
+        Returns the decoded response dict, or None if the viewer did not answer.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            request_id = next(self._ids)
+            payload = json.dumps({"v": PROTOCOL_VERSION, "id": request_id,
+                                  "atomic": atomic, "cmds": cmds}).encode("utf-8")
+            try:
+                s = self._socket()
+                s.sendto(payload, self.path)
+                deadline = time.monotonic() + timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    s.settimeout(remaining)
+                    reply = json.loads(s.recv(MAX_DATAGRAM).decode("utf-8"))
+                    if isinstance(reply, dict) and reply.get("id") == request_id:
+                        return reply
+            except socket.timeout:
+                return None
+            except (OSError, ValueError):
+                # Drop the socket; the next request starts from a fresh one
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+                return None
+
+    def query(self, name, value=None):
+        """Run one query command and return its value, or None."""
+        reply = self.request([command(name, value)])
+        if reply is None or not reply.get("ok"):
+            return None
+        return reply["results"][0].get("value")
@@ -0,0 +1,259 @@
+"""Image decoding in a separate process, off the render loop's cores.
+
+Decoding and LANCZOS-resizing a photo holds the GIL for long stretches,
+so done on a viewer thread it delays the blits of whatever is on screen.
+The decoder runs in its own process pinned to cores the render loop
+doesn't use (by default core 1; see DECODER_CPU_CORES in viewer.py and
+scripts/setup_isolcpus.sh; while the playlist warm-up in warmup.py runs,
+its niced workers share that core) and hands finished frames back through
+a pool of shared-memory segments:
+
+    renderer                              decoder process
+    --------                              ---------------
+    (request_id, path, size)  --pipe-->   decode, write segment file
+                              <--pipe--   (request_id, POOL, layout)
+    mmap segment, unlink it               store to the frame cache
+
+Each segment is a file in DECODE_POOL_DIR (tmpfs) holding the frame
+arrays back to back. The renderer maps it read-only and wraps the arrays
+around the mapping, so frames reach the panel without being copied; the
+file is unlinked as soon as it is mapped and the memory goes away with
+the last array that uses it.
+"""
+
+import itertools
+import math
+import mmap
+import multiprocessing
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import frame_cache
+from config import DECODE_POOL_DIR
+
+# Replies: frames in a pool segment, decoded but empty, already in the frame
+# cache, too big for the GIF budget (stream it instead), or failed
+POOL, EMPTY, CACHED, OVER_BUDGET, ERROR = range(5)
+
+# A decode taking longer than this is treated as a hung decoder
+DECODE_TIMEOUT_S = 120
+
+# Arrays in a segment start on this boundary
+_ALIGN = 64
+
+
+class DecodeError(RuntimeError):
+    pass
+
+
+# =============================================================================
+# Decoder process
+# =============================================================================
+
+def _write_segment(path, arrays):
+    """Write named arrays back to back; return their (name, dtype, shape, offset) layout."""
+    layout = []
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        for name, arr in arrays:
+            arr = np.ascontiguousarray(arr)
+            offset = -(-f.tell() // _ALIGN) * _ALIGN
+            f.write(b"\0" * (offset - f.tell()))
+            # A byte view, which (unlike memoryview.cast) also works for the empty
+            # palettes of an RGB animation
+            f.write(arr.reshape(-1).view(np.uint8))
+            layout.append((name, arr.dtype.str, arr.shape, offset))
+    os.replace(tmp, path)
+    return layout
+
+
+def _serve(conn, pool_dir, cores, gif_budget):
+    """Decoder process main loop: answer decode requests until the pipe closes."""
+    if cores:
+        try:
+            os.sched_setaffinity(0, cores)
+        except (AttributeError, OSError) as e:
+            print(f"Decoder: could not set CPU affinity: {e}")
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+        request_id, path, target_size = msg
+        # The renderer never waits on warm-up: without the entry lock the
+        # file is still decoded, but the warm-up worker holding it stores it
+        with frame_cache.EntryLock(path, target_size) as owner:
+            _serve_one(conn, pool_dir, gif_budget, request_id, path, target_size, owner)
+
+
+def _serve_one(conn, pool_dir, gif_budget, request_id, path, target_size, owner):
+    """Decode path and send the reply; store it to the frame cache if owner."""
+    try:
+        result = frame_cache.decode_image(path, target_size, gif_budget)
+    except frame_cache.OverBudget:
+        conn.send((request_id, OVER_BUDGET, None))
+        return
+    except Exception as e:
+        conn.send((request_id, ERROR, str(e)))
+        return
+    if result is None:
+        conn.send((request_id, EMPTY, None))
+        return
+
+    pixels, durations = result
+    if isinstance(pixels, frame_cache.Animation):
+        arrays = [("indices", pixels.indices), ("palettes", pixels.palettes)]
+    else:
+        arrays = [("pixels", pixels)]
+    segment = os.path.join(pool_dir, f"{os.getpid()}-{request_id}")
+    try:
+        layout = _write_segment(segment, arrays)
+    except OSError as e:
+        # Pool unusable (tmpfs full?): hand over through the frame cache
+        if frame_cache.store(path, target_size, pixels, durations):
+            conn.send((request_id, CACHED, None))
+        else:
+            conn.send((request_id, ERROR, f"no room for decoded frames: {e}"))
+        return
+    conn.send((request_id, POOL, (segment, layout, durations)))
+    # Persist for the next boot only after the renderer has its frames
+    if owner:
+        frame_cache.store(path, target_size, pixels, durations)
+
+
+# =============================================================================
+# Renderer side
+# =============================================================================
+
+def _map_segment(segment, layout):
+    """Map a pool segment and return {name: array} views into it."""
+    fd = os.open(segment, os.O_RDONLY)
+    try:
+        buf = mmap.mmap(fd, os.fstat(fd).st_size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+        os.unlink(segment)
+    return {name: np.frombuffer(buf, dtype=np.dtype(dtype), count=math.prod(shape),
+                                offset=offset).reshape(shape)
+            for name, dtype, shape, offset in layout}
+
+
+class Decoder:
+    """
+    Client for the decoder process. decode() may be called from several
+    threads; requests are served one at a time.
+    """
+
+    def __init__(self, cores=None, gif_budget=None, pool_dir=DECODE_POOL_DIR,
+                 timeout_s=DECODE_TIMEOUT_S):
+        self.cores = cores
+        self.gif_budget = gif_budget
+        self.pool_dir = pool_dir
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._conn = None
+        self._process = None
+        self.decodes = 0
+        self.restarts = 0
+
+    def start(self):
+        """Start the decoder process. Raises OSError if the pool can't be created."""
+        with self._lock:
+            self._start_locked()
+        return self
+
+    def _start_locked(self):
+        # Segments left by a previous decoder are never going to be mapped
+        shutil.rmtree(self.pool_dir, ignore_errors=True)
+        os.makedirs(self.pool_dir)
+        self._conn, child = self._ctx.Pipe()
+        self._process = self._ctx.Process(
+            target=_serve, args=(child, self.pool_dir, self.cores, self.gif_budget),
+            name="led-decoder", daemon=True)
+        self._process.start()
+        child.close()
+
+    def _stop_locked(self):
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._process.join(1.0)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
+        self._conn = self._process = None
+
+    def close(self):
+        with self._lock:
+            self._stop_locked()
+        shutil.rmtree(self.pool_dir, ignore_errors=True)
+
+    def _restart_locked(self):
+        self._stop_locked()
+        self.restarts += 1
+        self._start_locked()
+
+    def decode(self, path, target_size):
+        """
+        Decode path in the decoder process. Returns (pixels, durations) like
+        frame_cache.decode_image(), or None if it has no frames. Raises
+        frame_cache.OverBudget for animations over gif_budget and
+        DecodeError on failure.
+        """
+        with self._lock:
+            if self._process is None:
+                self._start_locked()
+            elif not self._process.is_alive():
+                self._restart_locked()
+            request_id = next(self._ids)
+            try:
+                self._conn.send((request_id, path, tuple(target_size)))
+                if not self._conn.poll(self.timeout_s):
+                    self._restart_locked()
+                    raise DecodeError(f"decoder timed out after {self.timeout_s}s")
+                reply_id, kind, payload = self._conn.recv()
+            except (EOFError, OSError) as e:
+                self._restart_locked()
+                raise DecodeError(f"decoder process died: {e}")
+            self.decodes += 1
+            if reply_id != request_id:
+                self._restart_locked()
+                raise DecodeError("decoder reply out of order")
+            if kind == POOL:
+                # Mapped under the lock: a restart clears the pool directory
+                segment, layout, durations = payload
+                arrays = _map_segment(segment, layout)
+                if "pixels" in arrays:
+                    return arrays["pixels"], None
+                return frame_cache.Animation(arrays["indices"], arrays["palettes"], durations), durations
+
+        if kind == CACHED:
+            result = frame_cache.load(path, target_size)
+            if result is None:
+                raise DecodeError("decoded frames missing from the cache")
+            return result
+        if kind == EMPTY:
+            return None
+        if kind == OVER_BUDGET:
+            raise frame_cache.OverBudget(path)
+        raise DecodeError(payload)
+
+    def stats(self):
+        process = self._process
+        return {
+            "pid": process.pid if process is not None else None,
+            "alive": bool(process is not None and process.is_alive()),
+            "decodes": self.decodes,
+            "restarts": self.restarts,
+        }
@@ -0,0 +1,68 @@
+"""Perceptual brightness scaling used by the viewer's fades.
+
+Scaling a frame in linear light is gamma-decode -> multiply -> gamma-encode.
+Since every input byte maps to exactly one output byte for a given level,
+the whole pipeline collapses into a (FADE_LEVELS x 256) lookup table built
+once at import; a fade step is then a single gather into a reusable buffer,
+split across cores for large walls (see tiles.py).
+"""
+
+import numpy as np
+
+import tiles
+
+GAMMA = 2.2
+
+# Levels are quantised to 1/256 steps (0..256 inclusive), matching the
+# fixed-point multiply the table replaces.
+FADE_LEVELS = 257
+
+
+def make_gamma_tables(gamma=GAMMA):
+    x = np.arange(256, dtype=np.float32) / 255.0
+    to_gamma = np.clip((x ** gamma) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    to_linear = np.clip((x ** (1.0 / gamma)) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    return to_gamma, to_linear
+
+
+def make_fade_lut(to_gamma, to_linear):
+    """Return a (FADE_LEVELS, 256) uint8 table; row s scales a byte by s/256 in linear light."""
+    s = np.arange(FADE_LEVELS, dtype=np.uint16)[:, None]
+    lin = to_linear.astype(np.uint16)[None, :]
+    return to_gamma[((lin * s) >> 8).astype(np.uint8)]
+
+
+_TO_GAMMA, _TO_LINEAR = make_gamma_tables(GAMMA)
+_FADE_LUT = make_fade_lut(_TO_GAMMA, _TO_LINEAR)
+
+# Output buffers keyed by frame shape, reused across fade steps
+_buffers = {}
+
+
+def _level_row(scale01):
+    s = int(scale01 * 256 + 0.5)
+    return _FADE_LUT[min(max(s, 0), FADE_LEVELS - 1)]
+
+
+def scale_perceptual(img_u8, scale01):
+    """Return a new array with img_u8 scaled to scale01 (0.0-1.0) perceptual brightness."""
+    return _level_row(scale01)[img_u8]
+
+
+def scale_perceptual_into(img_u8, scale01, out):
+    """Like scale_perceptual, but writes into out (uint8, same shape) without allocating."""
+    row = _level_row(scale01)
+    tiles.run(lambda src, dst: np.take(row, src, out=dst, mode="clip"), img_u8, out)
+    return out
+
+
+def fade_buffer(shape):
+    """Return the shared uint8 output buffer for frames of the given shape."""
+    buf = _buffers.get(shape)
+    if buf is None:
+        buf = _buffers[shape] = np.empty(shape, dtype=np.uint8)
+    return buf
+
+
+def smoothstep(t):
+    return t * t * (3.0 - 2.0 * t)
@@ -0,0 +1,601 @@
+"""Disk-backed cache of pre-decoded matrix-resolution frames.
+
+Decoding a JPEG/PNG/GIF and LANCZOS-resizing it to the panel size is by far
+the most expensive thing the viewer does, yet the output for a given source
+file and panel geometry never changes. Frames are stored as raw ``.npy``
+arrays under FRAME_CACHE_DIR and read back memory-mapped, so a cache hit
+costs one ``open`` + ``mmap`` instead of a full decode.
+
+Entries are keyed by (absolute path, mtime, size, width, height): editing or
+replacing a source file changes its key, so stale frames are never served.
+Orphaned entries are removed by ``prune()``.
+
+Animated GIFs are stored palette-indexed (see ``Animation``): one uint8
+index plane per frame plus a shared or per-frame 256-entry palette, with
+consecutive identical frames merged. That is ~1/3 of the RGB size, and
+frames are expanded to RGB only when they are blitted. Resampling can give
+a frame more than 256 colors; such animations are stored as plain RGB
+frames instead, so the cache always holds exactly what a stream shows.
+"""
+
+import collections
+import fcntl
+import hashlib
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from config import FRAME_CACHE_DIR
+
+# Bump when the on-disk layout changes so old entries are orphaned and pruned
+# (3: animations over 256 colors are stored as RGB instead of quantized)
+CACHE_VERSION = 3
+
+_SUFFIXES = (".npy", ".idx.npy", ".pal.npy", ".dur.npy")
+
+# Large stills are shrunk cheaply (JPEG DCT scaling, then Image.reduce) to no
+# less than this many times the panel size before the final LANCZOS pass.
+# 2.0 stays within ~37 dB PSNR of a full-resolution resample on the sample
+# images and decodes a 1724px JPEG for a 64x64 panel ~2.7x faster. None
+# always decodes and resamples at full resolution.
+DECODE_REDUCING_GAP = 2.0
+
+
+class Animation:
+    """
+    Palette-indexed animation. Frame i is palettes[i][indices[i]], or
+    palettes[0][indices[i]] when all frames share one palette. An animation
+    with a frame of more than 256 colors has no palettes, and indices holds
+    the (N, H, W, 3) RGB frames themselves.
+    """
+
+    def __init__(self, indices, palettes, durations):
+        self.indices = indices      # (N, H, W) uint8, or (N, H, W, 3) without palettes
+        self.palettes = palettes    # (1 or N, 256, 3) uint8, or (0, 256, 3)
+        self.durations = durations  # per-frame durations in ms
+        self._out = None
+
+    def __len__(self):
+        return len(self.indices)
+
+    def _palette(self, i):
+        return self.palettes[i if len(self.palettes) > 1 else 0]
+
+    @property
+    def is_rgb(self):
+        return len(self.palettes) == 0
+
+    def __getitem__(self, i):
+        """Return frame i as a new (H, W, 3) RGB array."""
+        if self.is_rgb:
+            return np.array(self.indices[i])
+        return self._palette(i)[self.indices[i]]
+
+    def render(self, i):
+        """Expand frame i to RGB into a buffer reused across calls (valid until the next call)."""
+        if self.is_rgb:
+            return self.indices[i]
+        if self._out is None:
+            self._out = np.empty(self.indices.shape[1:] + (3,), dtype=np.uint8)
+        np.take(self._palette(i), self.indices[i], axis=0, out=self._out, mode="clip")
+        return self._out
+
+    @property
+    def first_frame(self):
+        return self[0]
+
+    def play(self):
+        """Iterator over (rgb_frame, duration_ms), looping; each frame is valid until the next."""
+        return _AnimationPlayer(self)
+
+    def close(self):
+        pass
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.palettes.nbytes
+
+
+class _AnimationPlayer:
+    def __init__(self, anim):
+        self._anim = anim
+        self._next = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        i = self._next
+        self._next = (i + 1) % len(self._anim)
+        return self._anim.render(i), self._anim.durations[i]
+
+    def skip(self, seconds, min_ms=0):
+        """
+        Skip the frames whose whole slot (at least min_ms) fits in seconds,
+        without rendering them. Returns (frames skipped, seconds skipped).
+        """
+        count, skipped = 0, 0.0
+        while True:
+            slot = max(self._anim.durations[self._next], min_ms) / 1000.0
+            if slot <= 0 or skipped + slot > seconds:
+                return count, skipped
+            skipped += slot
+            count += 1
+            self._next = (self._next + 1) % len(self._anim)
+
+
+def cache_key(path, target_size):
+    """Return the cache key for a source file, or None if it can't be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    raw = (f"v{CACHE_VERSION}|{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|"
+           f"{target_size[0]}x{target_size[1]}")
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_paths(key):
+    """Return (still, indices, palettes, durations) file paths for a key."""
+    base = os.path.join(FRAME_CACHE_DIR, key)
+    return tuple(base + suffix for suffix in _SUFFIXES)
+
+
+def _draft(img, target_size):
+    """
+    Ask the JPEG decoder for the smallest DCT scale (1/2 .. 1/8) that still
+    leaves DECODE_REDUCING_GAP times the fitted size. Must be called before
+    the image is loaded; a no-op for other formats.
+    """
+    if DECODE_REDUCING_GAP is None:
+        return
+    w, h = img.size
+    scale = min(target_size[0] / w, target_size[1] / h) * DECODE_REDUCING_GAP
+    if scale < 1:
+        img.draft("RGB", (max(1, int(w * scale)), max(1, int(h * scale))))
+
+
+def _fit_to_canvas(img, target_size):
+    """Resize an RGB image to fit target_size and center it on a black canvas."""
+    img.thumbnail(target_size, Image.LANCZOS, reducing_gap=DECODE_REDUCING_GAP)
+    canvas = Image.new("RGB", target_size, (0, 0, 0))
+    x = (target_size[0] - img.width) // 2
+    y = (target_size[1] - img.height) // 2
+    canvas.paste(img, (x, y))
+    return np.asarray(canvas, dtype=np.uint8)
+
+
+def _color_keys(rgb):
+    """Pack (..., 3) uint8 RGB into (...) uint32 keys."""
+    rgb = rgb.astype(np.uint32)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def _keys_to_rgb(keys):
+    return np.stack([(keys >> 16) & 0xFF, (keys >> 8) & 0xFF, keys & 0xFF], axis=-1).astype(np.uint8)
+
+
+def _index_frame(rgb):
+    """
+    Return (indices (H, W) uint8, palette (K, 3) uint8) for an RGB frame,
+    K <= 256, or None if it has more than 256 colors.
+    """
+    keys = _color_keys(rgb)
+    colors, inverse = np.unique(keys, return_inverse=True)
+    if len(colors) > 256:
+        return None
+    return inverse.reshape(keys.shape).astype(np.uint8), _keys_to_rgb(colors)
+
+
+class _AnimationBuilder:
+    """
+    Accumulate decoded RGB frames as compact indexed frames, merging runs of
+    identical frames. From the first frame with more than 256 colors on,
+    all frames are kept as RGB (the earlier ones expanded back, losslessly).
+    With max_bytes set, gives up (add() returns False) once the compact size
+    would exceed it.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.indexed = []  # (indices, palette) pairs, or RGB frames once self.rgb
+        self.rgb = False
+        self.durations = []
+        self.nbytes = 0
+        self._prev = None
+
+    def add(self, frame, duration):
+        if self._prev is not None and np.array_equal(frame, self._prev):
+            self.durations[-1] += duration
+            return True
+        if not self.rgb:
+            item = _index_frame(frame)
+            if item is None:
+                self.indexed = [pal[idx] for idx, pal in self.indexed]
+                self.nbytes = sum(f.nbytes for f in self.indexed)
+                self.rgb = True
+        if self.rgb:
+            item = frame
+            self.nbytes += frame.nbytes
+        else:
+            self.nbytes += item[0].nbytes + item[1].nbytes
+        if self.max_bytes is not None and self.nbytes > self.max_bytes:
+            self.indexed = []
+            return False
+        self.indexed.append(item)
+        self.durations.append(duration)
+        self._prev = frame
+        return True
+
+    def build(self):
+        if not self.indexed:
+            return None
+        if self.rgb:
+            return Animation(np.stack(self.indexed), np.zeros((0, 256, 3), dtype=np.uint8),
+                             self.durations)
+        return _build_animation(self.indexed, self.durations)
+
+
+def _build_animation(indexed, durations):
+    """Pack per-frame (indices, palette) pairs, sharing one palette if the colors fit."""
+    n = len(indexed)
+    indices = np.empty((n,) + indexed[0][0].shape, dtype=np.uint8)
+    all_colors = np.unique(np.concatenate([_color_keys(pal) for _, pal in indexed]))
+
+    if len(all_colors) <= 256:
+        palettes = np.zeros((1, 256, 3), dtype=np.uint8)
+        palettes[0, :len(all_colors)] = _keys_to_rgb(all_colors)
+        for i, (idx, pal) in enumerate(indexed):
+            remap = np.searchsorted(all_colors, _color_keys(pal)).astype(np.uint8)
+            indices[i] = remap[idx]
+    else:
+        palettes = np.zeros((n, 256, 3), dtype=np.uint8)
+        for i, (idx, pal) in enumerate(indexed):
+            indices[i] = idx
+            palettes[i, :len(pal)] = pal
+
+    return Animation(indices, palettes, durations)
+
+
+class OverBudget(Exception):
+    """An animation's compact form would exceed the max_bytes given to decode_image()."""
+
+
+def decode_image(path, target_size, max_bytes=None):
+    """
+    Decode a source image to matrix resolution.
+    Returns (pixels, durations): pixels is an (H, W, 3) array for stills
+    with durations None, or an Animation for animated GIFs with a list of
+    per-frame durations in ms. Returns None if a GIF yields no frames.
+    Raises on unreadable files, and OverBudget if max_bytes is set and an
+    animation doesn't fit in it.
+    """
+    with Image.open(path) as img:
+        is_animated_gif = getattr(img, "is_animated", False) and path.lower().endswith('.gif')
+
+        if is_animated_gif:
+            builder = _AnimationBuilder(max_bytes)
+            try:
+                while True:
+                    if not builder.add(_fit_to_canvas(img.convert("RGB"), target_size),
+                                       img.info.get('duration', 100)):
+                        raise OverBudget(path)
+                    img.seek(img.tell() + 1)
+            except EOFError:
+                pass
+            anim = builder.build()
+            if anim is None:
+                return None
+            return anim, anim.durations
+
+        _draft(img, target_size)
+        frame = img.convert("RGB") if img.mode != "RGB" else img.copy()
+        return _fit_to_canvas(frame, target_size), None
+
+
+def load(path, target_size):
+    """Return cached (pixels, durations) for path, memory-mapped, or None on miss."""
+    key = cache_key(path, target_size)
+    if key is None:
+        return None
+    still_path, idx_path, pal_path, dur_path = _entry_paths(key)
+    try:
+        return np.load(still_path, mmap_mode="r"), None
+    except (OSError, ValueError):
+        pass
+    try:
+        indices = np.load(idx_path, mmap_mode="r")
+        palettes = np.load(pal_path)
+        durations = np.load(dur_path).tolist()
+    except (OSError, ValueError):
+        return None
+    return Animation(indices, palettes, durations), durations
+
+
+def is_cached(path, target_size):
+    """True if path has a complete cache entry (without opening it)."""
+    key = cache_key(path, target_size)
+    if key is None:
+        return False
+    still_path, idx_path, _, _ = _entry_paths(key)
+    return os.path.exists(still_path) or os.path.exists(idx_path)
+
+
+def store(path, target_size, pixels, durations):
+    """Write decoded frames to the cache atomically. Returns True on success."""
+    key = cache_key(path, target_size)
+    if key is None:
+        return False
+    still_path, idx_path, pal_path, dur_path = _entry_paths(key)
+    try:
+        os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+        if isinstance(pixels, Animation):
+            # Indices last: load() treats their presence as a complete entry
+            _atomic_save(dur_path, np.asarray(durations, dtype=np.int32))
+            _atomic_save(pal_path, pixels.palettes)
+            _atomic_save(idx_path, pixels.indices)
+        else:
+            _atomic_save(still_path, np.ascontiguousarray(pixels, dtype=np.uint8))
+        return True
+    except OSError:
+        return False
+
+
+class EntryLock:
+    """
+    Advisory lock on the cache entry of path (a .lock file beside it), held
+    while decoding path for the cache so that two processes (the viewer's
+    decoder and warm-up workers) don't decode and store the same entry at
+    once. Never blocks: entering yields True if this process owns the entry,
+    False if another process is decoding it. Without a writable cache
+    directory there is nothing to coordinate, and it yields True.
+    """
+
+    def __init__(self, path, target_size):
+        key = cache_key(path, target_size)
+        self.lock_path = os.path.join(FRAME_CACHE_DIR, key + ".lock") if key else None
+        self._fd = None
+
+    def __enter__(self):
+        if self.lock_path is None:
+            return True
+        try:
+            os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+            self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            return True
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            os.close(self._fd)  # releases the lock
+            self._fd = None
+        return False
+
+
+def _atomic_save(dest, arr):
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, dest)
+
+
+def get_or_decode(path, target_size):
+    """
+    Return (pixels, durations) for path, decoding and caching on a miss.
+    Returns None if the image yields no frames; raises on decode errors.
+    """
+    cached = load(path, target_size)
+    if cached is not None:
+        return cached
+    result = decode_image(path, target_size)
+    if result is None:
+        return None
+    store(path, target_size, *result)
+    return load(path, target_size) or result
+
+
+class GifStream:
+    """
+    Animated GIF decoded incrementally by a worker thread into a bounded ring
+    of RGB frames just ahead of playback, so time to first frame doesn't
+    depend on GIF length and memory stays at ring_frames frames.
+
+    While decoding the first pass the worker also builds the compact
+    Animation; if that fits in cache_budget bytes it is written to the frame
+    cache and playback switches to it, otherwise the GIF keeps streaming.
+    """
+
+    # Stop a worker whose ring has sat full and unread this long; play()
+    # restarts it from frame 0
+    IDLE_TIMEOUT_S = 120
+
+    def __init__(self, path, target_size, ring_frames, cache_budget):
+        self.path = path
+        self.target_size = target_size
+        self.ring_frames = max(2, ring_frames)
+        self.cache_budget = cache_budget
+        self.durations = []  # filled in as the first pass is decoded
+        self._cond = threading.Condition()
+        self._ring = collections.deque()
+        self._generation = 0
+        self._worker = None
+        self._full = None
+        self._failed = False
+        with Image.open(path) as img:
+            self.first_frame = _fit_to_canvas(img.convert("RGB"), target_size)
+        self._start()
+
+    def _start(self):
+        with self._cond:
+            if self._worker is None and self._full is None and not self._failed:
+                self._start_locked()
+
+    def _start_locked(self):
+        self._generation += 1
+        self._ring.clear()
+        self._worker = threading.Thread(target=self._run, args=(self._generation,), daemon=True)
+        self._worker.start()
+
+    def close(self):
+        """Stop decoding and release the ring buffer."""
+        with self._cond:
+            self._generation += 1
+            self._worker = None
+            self._ring.clear()
+            self._cond.notify_all()
+
+    def _push(self, gen, frame, duration):
+        """Append to the ring, blocking while full. Returns False if the worker should exit."""
+        with self._cond:
+            while len(self._ring) >= self.ring_frames and gen == self._generation:
+                if not self._cond.wait(self.IDLE_TIMEOUT_S):
+                    self._generation += 1
+                    self._worker = None
+                    self._ring.clear()
+                    return False
+            if gen != self._generation:
+                return False
+            self._ring.append((frame, duration))
+            self._cond.notify_all()
+            return True
+
+    def _run(self, gen):
+        builder = _AnimationBuilder(self.cache_budget)
+        first_pass = True
+        del self.durations[:]
+        try:
+            with Image.open(self.path) as img:
+                while True:
+                    duration = img.info.get('duration', 100)
+                    frame = _fit_to_canvas(img.convert("RGB"), self.target_size)
+                    if first_pass:
+                        self.durations.append(duration)
+                        if builder is not None and not builder.add(frame, duration):
+                            builder = None  # over budget: stream every loop
+                    if not self._push(gen, frame, duration):
+                        return
+                    try:
+                        img.seek(img.tell() + 1)
+                    except EOFError:
+                        if first_pass and builder is not None:
+                            anim = builder.build()
+                            store(self.path, self.target_size, anim, anim.durations)
+                            with self._cond:
+                                if gen == self._generation:
+                                    self._full = anim
+                                    self._worker = None
+                                    self._cond.notify_all()
+                            return
+                        first_pass = False
+                        img.seek(0)
+        except Exception as e:
+            print(f"GIF stream error for {self.path}: {e}")
+            with self._cond:
+                if gen == self._generation:
+                    self._failed = True
+                    self._worker = None
+                    self._cond.notify_all()
+
+    def play(self):
+        """Iterator over (rgb_frame, duration_ms), looping; blocks briefly if decode falls behind."""
+        self._start()
+        return _StreamPlayer(self)
+
+
+class _StreamPlayer:
+    def __init__(self, stream):
+        self._stream = stream
+        self._full = None  # player of the cached Animation once the stream switched to it
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._full is not None:
+            return next(self._full)
+        s = self._stream
+        with s._cond:
+            while not s._ring and s._full is None and not s._failed:
+                if s._worker is None:
+                    s._start_locked()
+                s._cond.wait()
+            if s._ring:
+                item = s._ring.popleft()
+                s._cond.notify_all()
+                return item
+        if s._full is not None:
+            self._full = s._full.play()
+            return next(self._full)
+        # Broken mid-stream: hold the first frame
+        return s.first_frame, 1000
+
+    def skip(self, seconds, min_ms=0):
+        """
+        Like _AnimationPlayer.skip(), but only frames the worker has already
+        decoded are skipped; never waits for a decode.
+        """
+        if self._full is not None:
+            return self._full.skip(seconds, min_ms)
+        s = self._stream
+        count, skipped = 0, 0.0
+        with s._cond:
+            while s._ring:
+                slot = max(s._ring[0][1], min_ms) / 1000.0
+                if slot <= 0 or skipped + slot > seconds:
+                    break
+                s._ring.popleft()
+                skipped += slot
+                count += 1
+            if count:
+                s._cond.notify_all()
+        return count, skipped
+
+
+def is_animated_gif(path):
+    if not path.lower().endswith('.gif'):
+        return False
+    with Image.open(path) as img:
+        return getattr(img, "is_animated", False)
+
+
+def open_for_playback(path, target_size, ring_frames, cache_budget):
+    """
+    Like get_or_decode(), but an uncached animated GIF is returned as a
+    GifStream instead of being decoded in full first.
+    """
+    cached = load(path, target_size)
+    if cached is not None:
+        return cached
+    if is_animated_gif(path):
+        stream = GifStream(path, target_size, ring_frames, cache_budget)
+        return stream, stream.durations
+    return get_or_decode(path, target_size)
+
+
+def prune(paths, target_size):
+    """Delete cache entries that don't belong to the current version of any path."""
+    if not os.path.isdir(FRAME_CACHE_DIR):
+        return 0
+    keep = set()
+    for p in paths:
+        key = cache_key(p, target_size)
+        if key is not None:
+            keep.update(os.path.basename(e) for e in _entry_paths(key))
+            keep.add(key + ".lock")
+    removed = 0
+    for name in os.listdir(FRAME_CACHE_DIR):
+        if name in keep or name.endswith(".tmp"):
+            continue
+        try:
+            os.unlink(os.path.join(FRAME_CACHE_DIR, name))
+            removed += 1
+        except OSError:
+            pass
+    return removed
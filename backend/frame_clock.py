@@ -0,0 +1,106 @@
+"""Central render clock for the viewer.
+
+Every display mode (fades, GIF playback) schedules its frames at absolute
+``time.monotonic()`` deadlines instead of sleeping for relative durations,
+so wake-up latency never accumulates into drift. The clock records how late
+each frame actually was, and when rendering falls behind by a whole frame
+slot or more the caller skips ahead rather than playing every frame late.
+"""
+
+import threading
+import time
+
+# A frame presented later than this after its deadline counts as late
+LATE_THRESHOLD_S = 0.002
+
+# Lateness beyond this (e.g. after a system stall) re-anchors the schedule
+# to now instead of dropping a long run of frames to catch up
+RESYNC_THRESHOLD_S = 1.0
+
+
+class FrameClock:
+    def __init__(self, lateness_hist=None):
+        """lateness_hist: optional metrics.Histogram fed with each frame's lateness in ms."""
+        self._lock = threading.Lock()
+        self._lateness_hist = lateness_hist
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+        self.resyncs = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self._window = (0, 0, 0, 0.0)
+
+    @staticmethod
+    def now():
+        return time.monotonic()
+
+    @staticmethod
+    def wait(deadline):
+        """Sleep until the monotonic deadline (no-op if it has passed)."""
+        remain = deadline - time.monotonic()
+        if remain > 0:
+            time.sleep(remain)
+
+    def record(self, deadline):
+        """Record presenting a frame scheduled for deadline. Returns its lateness in seconds."""
+        lateness = time.monotonic() - deadline
+        if self._lateness_hist is not None:
+            self._lateness_hist.add(max(0.0, lateness) * 1000.0)
+        with self._lock:
+            self.frames += 1
+            if lateness > LATE_THRESHOLD_S:
+                self.late += 1
+                self.total_lateness += lateness
+                if lateness > self.max_lateness:
+                    self.max_lateness = lateness
+        return lateness
+
+    def drop(self, count=1):
+        with self._lock:
+            self.dropped += count
+
+    def resync(self):
+        with self._lock:
+            self.resyncs += 1
+
+    def due_index(self, start, period, index):
+        """
+        For a fixed-rate sequence with frame i due at start + i * period:
+        record frame `index` as presented and return the index that should
+        actually be drawn now, skipping frames whose slot has already passed.
+        """
+        lateness = self.record(start + index * period)
+        if lateness >= period:
+            skip = int(lateness // period)
+            self.drop(skip)
+            return index + skip
+        return index
+
+    def stats(self):
+        """Return cumulative timing counters since startup."""
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "late": self.late,
+                "dropped": self.dropped,
+                "resyncs": self.resyncs,
+                "mean_lateness_ms": round(1000.0 * self.total_lateness / self.late, 2) if self.late else 0.0,
+                "max_lateness_ms": round(1000.0 * self.max_lateness, 2),
+            }
+
+    def drift_report(self):
+        """
+        Return a one-line summary of frames that were late or dropped since
+        the previous call, or None if everything was on time.
+        """
+        with self._lock:
+            frames, late, dropped, total = self.frames, self.late, self.dropped, self.total_lateness
+            f0, l0, d0, t0 = self._window
+            self._window = (frames, late, dropped, total)
+        if late == l0 and dropped == d0:
+            return None
+        n_late = late - l0
+        mean_ms = 1000.0 * (total - t0) / n_late if n_late else 0.0
+        return (f"{frames - f0} frames: {n_late} late (mean {mean_ms:.1f} ms), "
+                f"{dropped - d0} dropped")
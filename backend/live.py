@@ -0,0 +1,373 @@
+"""Live frame input: show frames pushed by other processes in real time.
+
+Frames are full matrix-resolution RGB24 images (height x width x 3 bytes,
+row-major). Producers can deliver them three ways:
+
+Shared-memory ring (lowest latency, local only): a file, normally under
+/dev/shm, laid out as a 64-byte header followed by ``slots`` frame slots.
+
+    header: magic b"LEDR", u16 version, u16 width, u16 height, u16 slots,
+            u64 write_seq at offset 16 (little-endian, rest zero)
+    slot i: u64 seq, u64 timestamp_ns, then the frame bytes
+
+To publish frame n (n starts at 1) a producer zeroes slot n % slots' seq,
+writes the timestamp and pixels, sets the slot's seq to n and then
+write_seq to n. RingWriter does exactly this.
+
+Datagrams on the live Unix socket or a UDP port, one of:
+
+    raw     b"LEDF", u64 timestamp_ns (little-endian), frame bytes
+    DDP     the DDP pixel protocol; a frame may span packets and is shown
+            when the packet with the push flag arrives
+    E1.31   sACN universes of 170 RGB pixels each, starting at the
+            configured universe; shown when the last universe arrives
+
+Timestamps are CLOCK_MONOTONIC nanoseconds (time.monotonic_ns() in
+Python), which is system-wide on Linux, so latency is measured from the
+producer to the blit. DDP and E1.31 carry no such timestamp, so their
+latency is measured from receipt.
+
+Only the newest frame is kept: a frame that arrives before the previous
+one was displayed replaces it and is counted as dropped, so a producer
+faster than the panel never builds up a queue.
+"""
+
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+RING_MAGIC = b"LEDR"
+RING_VERSION = 1
+RING_HEADER_SIZE = 64
+_RING_HEADER = struct.Struct("<4sHHHH")
+_WRITE_SEQ = struct.Struct("<Q")
+_WRITE_SEQ_OFFSET = 16
+_SLOT_HEADER = struct.Struct("<QQ")
+
+PACKET_MAGIC = b"LEDF"
+_PACKET_HEADER = struct.Struct("<4sQ")
+
+DDP_PORT = 4048
+E131_PORT = 5568
+_DDP_HEADER = struct.Struct(">BBBBIH")
+_DDP_PUSH = 0x01
+_DDP_TIMECODE = 0x10
+_E131_ID = b"ASC-E1.17\x00\x00\x00"
+_E131_PIXELS_PER_UNIVERSE = 170
+
+# How often the ring is checked for a new frame while a producer is
+# active (a frame arrived within RING_ACTIVE_S). Once it goes quiet the
+# interval doubles up to RING_IDLE_POLL_S, so an idle ring costs ~10
+# wake-ups a second. RING_OPEN_POLL_S is the check for the ring file to
+# appear while no producer has created it.
+RING_POLL_S = 0.002
+RING_ACTIVE_S = 1.0
+RING_IDLE_POLL_S = 0.1
+RING_OPEN_POLL_S = 0.5
+
+# How often an open ring is checked for having been removed or recreated
+RING_REOPEN_CHECK_S = 1.0
+
+
+def _slot_offset(index, frame_bytes):
+    return RING_HEADER_SIZE + index * (_SLOT_HEADER.size + frame_bytes)
+
+
+def ring_size(width, height, slots):
+    return _slot_offset(slots, width * height * 3)
+
+
+class RingWriter:
+    """Producer side of the shared-memory ring."""
+
+    def __init__(self, path, width, height, slots=4):
+        self.width, self.height, self.slots = width, height, slots
+        self.frame_bytes = width * height * 3
+        size = ring_size(width, height, slots)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._map[:RING_HEADER_SIZE] = bytes(RING_HEADER_SIZE)
+        _RING_HEADER.pack_into(self._map, 0, RING_MAGIC, RING_VERSION, width, height, slots)
+        self.seq = 0
+
+    def write(self, frame, timestamp_ns=None):
+        data = memoryview(np.ascontiguousarray(frame, dtype=np.uint8)).cast("B")
+        if len(data) != self.frame_bytes:
+            raise ValueError(f"frame must be {self.height}x{self.width}x3")
+        self.seq += 1
+        off = _slot_offset(self.seq % self.slots, self.frame_bytes)
+        ts = time.monotonic_ns() if timestamp_ns is None else timestamp_ns
+        _SLOT_HEADER.pack_into(self._map, off, 0, ts)
+        self._map[off + _SLOT_HEADER.size:off + _SLOT_HEADER.size + self.frame_bytes] = data
+        _SLOT_HEADER.pack_into(self._map, off, self.seq, ts)
+        _WRITE_SEQ.pack_into(self._map, _WRITE_SEQ_OFFSET, self.seq)
+
+    def close(self):
+        self._map.close()
+
+
+class RingReader:
+    """
+    Consumer side of the shared-memory ring; opens the file lazily. With
+    skip_existing, a frame already in the ring when it is opened is not
+    returned (it is stale for live input, but wanted for a preview).
+    """
+
+    def __init__(self, path, width, height, skip_existing=True):
+        self.path = path
+        self.width, self.height = width, height
+        self.frame_bytes = width * height * 3
+        self.skip_existing = skip_existing
+        self._map = None
+        self._ino = None
+        self._last = 0
+
+    def _open(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._close()
+            return False
+        if self._map is not None and st.st_ino == self._ino:
+            return True
+        self._close()
+        with open(self.path, "rb") as f:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return False  # empty file, producer still setting up
+        magic, version, width, height, slots = _RING_HEADER.unpack_from(m, 0)
+        if (magic != RING_MAGIC or version != RING_VERSION or (width, height) != (self.width, self.height)
+                or slots == 0 or len(m) < ring_size(width, height, slots)):
+            m.close()
+            return False
+        self._map, self._ino, self._slots = m, st.st_ino, slots
+        self._last = _WRITE_SEQ.unpack_from(m, _WRITE_SEQ_OFFSET)[0] if self.skip_existing else 0
+        return True
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._ino = None
+
+    @property
+    def is_open(self):
+        return self._map is not None
+
+    def poll(self):
+        """Return (frame, timestamp_ns, skipped) for the newest unseen frame, or None."""
+        if self._map is None and not self._open():
+            return None
+        m = self._map
+        seq = _WRITE_SEQ.unpack_from(m, _WRITE_SEQ_OFFSET)[0]
+        if seq < self._last:
+            self._last = 0  # producer restarted
+        if seq == self._last:
+            return None
+        off = _slot_offset(seq % self._slots, self.frame_bytes)
+        start = off + _SLOT_HEADER.size
+        s1, ts = _SLOT_HEADER.unpack_from(m, off)
+        frame = np.frombuffer(m[start:start + self.frame_bytes], dtype=np.uint8)
+        s2 = _SLOT_HEADER.unpack_from(m, off)[0]
+        if s1 != seq or s2 != seq:
+            return None  # overwritten while copying; the next poll gets a newer one
+        skipped = max(0, seq - self._last - 1)
+        self._last = seq
+        return frame.reshape(self.height, self.width, 3), ts, skipped
+
+    def reopen_if_replaced(self):
+        """Drop the mapping if the ring file was removed or recreated."""
+        if self._map is None:
+            return
+        try:
+            if os.stat(self.path).st_ino == self._ino:
+                return
+        except OSError:
+            pass
+        self._close()
+
+
+class PacketDecoder:
+    """Reassemble frames from raw, DDP or E1.31 datagrams."""
+
+    def __init__(self, width, height, e131_universe=1):
+        self.width, self.height = width, height
+        self.frame_bytes = width * height * 3
+        self.e131_universe = e131_universe
+        self.e131_last = e131_universe + (width * height - 1) // _E131_PIXELS_PER_UNIVERSE
+        self._ddp = bytearray(self.frame_bytes)
+        self._e131 = bytearray(self.frame_bytes)
+
+    def _frame(self, buf):
+        return np.frombuffer(bytes(buf), dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def feed(self, data):
+        """
+        Return (frame, timestamp_ns or None) when data completes a frame,
+        None when more packets are needed. Raises ValueError on bad packets.
+        """
+        if data[:4] == PACKET_MAGIC:
+            if len(data) != _PACKET_HEADER.size + self.frame_bytes:
+                raise ValueError(f"raw frame must be {self.frame_bytes} bytes")
+            _, ts = _PACKET_HEADER.unpack_from(data)
+            return self._frame(data[_PACKET_HEADER.size:]), ts
+        if len(data) >= 126 and data[4:16] == _E131_ID:
+            return self._feed_e131(data)
+        if len(data) >= _DDP_HEADER.size and data[0] & 0xC0 == 0x40:
+            return self._feed_ddp(data)
+        raise ValueError("unrecognised packet")
+
+    def _feed_ddp(self, data):
+        flags, _, _, _, offset, length = _DDP_HEADER.unpack_from(data)
+        start = _DDP_HEADER.size + (4 if flags & _DDP_TIMECODE else 0)
+        payload = data[start:start + length]
+        end = min(offset + len(payload), self.frame_bytes)
+        if offset < end:
+            self._ddp[offset:end] = payload[:end - offset]
+        if flags & _DDP_PUSH:
+            return self._frame(self._ddp), None
+        return None
+
+    def _feed_e131(self, data):
+        if data[18:22] != b"\x00\x00\x00\x04":
+            return None  # not a data packet (e.g. sync or discovery)
+        universe = struct.unpack_from(">H", data, 113)[0]
+        count = struct.unpack_from(">H", data, 123)[0]
+        if not self.e131_universe <= universe <= self.e131_last:
+            return None
+        dmx = data[126:125 + count]
+        offset = (universe - self.e131_universe) * _E131_PIXELS_PER_UNIVERSE * 3
+        end = min(offset + len(dmx), self.frame_bytes)
+        self._e131[offset:end] = dmx[:end - offset]
+        if universe == self.e131_last:
+            return self._frame(self._e131), None
+        return None
+
+
+class LiveInput:
+    """
+    Collect live frames from the ring and sockets. Only the newest frame is
+    kept; on_frame() is called whenever one arrives.
+    """
+
+    def __init__(self, width, height, ring_path=None, unix_path=None, udp_addrs=(),
+                 e131_universe=1, on_frame=None):
+        self.width, self.height = width, height
+        self.ring_path = ring_path
+        self.unix_path = unix_path
+        self.udp_addrs = list(udp_addrs)
+        self.e131_universe = e131_universe
+        self.on_frame = on_frame
+        self._lock = threading.Lock()
+        self._pending = None    # (frame, timestamp_ns)
+        self.last_rx = None     # time.monotonic() of the newest frame
+        self.received = 0
+        self.dropped = 0
+        self.invalid = 0
+
+    def start(self):
+        if self.ring_path:
+            threading.Thread(target=self._ring_loop, daemon=True).start()
+        socks = []
+        if self.unix_path:
+            try:
+                os.unlink(self.unix_path)
+            except FileNotFoundError:
+                pass
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            s.bind(self.unix_path)
+            socks.append((s, self.unix_path))
+        for host, port in self.udp_addrs:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((host, port))
+            socks.append((s, f"udp {host}:{port}"))
+        for s, name in socks:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            threading.Thread(target=self._socket_loop, args=(s,), daemon=True).start()
+            print(f"Live input listening on {name}")
+        return self
+
+    def _offer(self, frame, timestamp_ns, skipped=0):
+        with self._lock:
+            if self._pending is not None:
+                self.dropped += 1
+            self.dropped += skipped
+            self._pending = (frame, timestamp_ns)
+            self.received += 1
+            self.last_rx = time.monotonic()
+        if self.on_frame is not None:
+            self.on_frame()
+
+    def _ring_loop(self):
+        reader = RingReader(self.ring_path, self.width, self.height)
+        interval = RING_POLL_S
+        last_frame = last_check = time.monotonic()
+        while True:
+            now = time.monotonic()
+            try:
+                item = reader.poll()
+                if item is not None:
+                    self._offer(*item)
+                    interval = RING_POLL_S
+                    last_frame = now
+                    continue
+                if now - last_check >= RING_REOPEN_CHECK_S:
+                    last_check = now
+                    reader.reopen_if_replaced()
+            except Exception as e:
+                print(f"Live ring error: {e}")
+                time.sleep(1.0)
+            if not reader.is_open:
+                interval = RING_OPEN_POLL_S
+            elif now - last_frame < RING_ACTIVE_S:
+                interval = RING_POLL_S
+            else:
+                interval = min(RING_IDLE_POLL_S, max(RING_POLL_S, interval * 2))
+            time.sleep(interval)
+
+    def _socket_loop(self, s):
+        decoder = PacketDecoder(self.width, self.height, self.e131_universe)
+        while True:
+            try:
+                data = s.recv(65536)
+                result = decoder.feed(data)
+            except ValueError:
+                with self._lock:
+                    self.invalid += 1
+                continue
+            except OSError as e:
+                print(f"Live socket error: {e}")
+                time.sleep(0.5)
+                continue
+            if result is not None:
+                frame, ts = result
+                self._offer(frame, ts if ts is not None else time.monotonic_ns())
+
+    def has_pending(self):
+        return self._pending is not None
+
+    def take(self):
+        """Return the newest undisplayed (frame, timestamp_ns), or None."""
+        with self._lock:
+            item, self._pending = self._pending, None
+        return item
+
+    def active(self, timeout_s):
+        """True if a frame arrived within the last timeout_s seconds."""
+        last = self.last_rx
+        return last is not None and time.monotonic() - last < timeout_s
+
+    def stats(self):
+        with self._lock:
+            return {"received": self.received, "dropped": self.dropped, "invalid": self.invalid}
@@ -0,0 +1,177 @@
+"""Output backends for the viewer.
+
+The viewer only uses a small slice of the rgbmatrix API: ``width``,
+``height``, ``brightness``, ``CreateFrameCanvas()``, ``SwapOnVSync()`` and
+``Clear()`` on the matrix, and ``SetImage()`` / ``brightness`` on canvases.
+``create_matrix()`` returns either the real hardware matrix or a
+``SimMatrix`` that implements the same surface in memory, so the viewer can
+run, be driven over CTRL_SOCK and be profiled on any Linux box.
+
+Selection: the LED_MATRIX_BACKEND environment variable ("hardware" or
+"sim") wins over ``backend`` in the ``[matrix]`` section of config.ini;
+the default is hardware. The simulator can dump every presented frame with
+LED_MATRIX_SIM_DUMP=<dir> (PNG files, or one raw RGB stream with
+LED_MATRIX_SIM_DUMP_FORMAT=raw).
+"""
+
+import collections
+import configparser
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from config import CONFIG_FILE
+
+BACKENDS = ("hardware", "sim")
+
+# Simulated panel refresh rate; SwapOnVSync blocks until the next tick
+SIM_REFRESH_HZ = 120
+
+# Presented frames kept in memory by the simulator
+SIM_HISTORY = 256
+
+
+def backend_name():
+    """Return the configured backend name, from the environment or config.ini."""
+    name = os.environ.get("LED_MATRIX_BACKEND")
+    if not name and os.path.isfile(CONFIG_FILE):
+        config = configparser.ConfigParser()
+        try:
+            config.read(CONFIG_FILE)
+            name = config.get("matrix", "backend", fallback=None)
+        except configparser.Error as e:
+            print(f"Error reading backend from config: {e}")
+    name = (name or "hardware").strip().lower()
+    if name not in BACKENDS:
+        print(f"Unknown matrix backend '{name}', using hardware")
+        name = "hardware"
+    return name
+
+
+def create_matrix(rows, cols, chain_length, parallel, brightness, hardware_options=None, backend=None):
+    """Create the matrix for the configured (or given) backend."""
+    backend = backend or backend_name()
+    if backend == "sim":
+        return SimMatrix(
+            rows, cols, chain_length, parallel, brightness,
+            dump_dir=os.environ.get("LED_MATRIX_SIM_DUMP"),
+            dump_format=os.environ.get("LED_MATRIX_SIM_DUMP_FORMAT", "png"),
+        )
+
+    from rgbmatrix import RGBMatrix, RGBMatrixOptions
+
+    options = RGBMatrixOptions()
+    options.rows = rows
+    options.cols = cols
+    options.chain_length = chain_length
+    options.parallel = parallel
+    options.brightness = brightness
+    for name, value in (hardware_options or {}).items():
+        setattr(options, name, value)
+    return RGBMatrix(options=options)
+
+
+class SimCanvas:
+    """In-memory stand-in for rgbmatrix.FrameCanvas."""
+
+    def __init__(self, width, height, brightness):
+        self.width = width
+        self.height = height
+        self.brightness = brightness
+        self.pixels = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        src = np.asarray(image)
+        x0, y0 = max(0, offset_x), max(0, offset_y)
+        x1 = min(self.width, offset_x + src.shape[1])
+        y1 = min(self.height, offset_y + src.shape[0])
+        if x1 > x0 and y1 > y0:
+            self.pixels[y0:y1, x0:x1] = src[y0 - offset_y:y1 - offset_y, x0 - offset_x:x1 - offset_x]
+
+    def SetPixel(self, x, y, r, g, b):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.pixels[y, x] = (r, g, b)
+
+    def Fill(self, r, g, b):
+        self.pixels[:] = (r, g, b)
+
+    def Clear(self):
+        self.pixels[:] = 0
+
+
+class SimMatrix:
+    """
+    Headless matrix: double-buffered like the real one, with SwapOnVSync
+    paced to SIM_REFRESH_HZ. Each presented frame is recorded with its
+    time.monotonic() timestamp in ``history`` and optionally dumped to disk.
+    """
+
+    def __init__(self, rows, cols, chain_length, parallel, brightness,
+                 dump_dir=None, dump_format="png", refresh_hz=SIM_REFRESH_HZ):
+        self.width = cols * chain_length
+        self.height = rows * parallel
+        self.brightness = brightness
+        self.refresh_hz = refresh_hz
+        self.frame_count = 0
+        self.history = collections.deque(maxlen=SIM_HISTORY)  # (timestamp, brightness, pixels)
+        self._lock = threading.Lock()
+        self._front = SimCanvas(self.width, self.height, brightness)
+        self._epoch = time.monotonic()
+        self._dump_dir = dump_dir
+        self._dump_format = dump_format
+        self._raw = None
+        if dump_dir:
+            os.makedirs(dump_dir, exist_ok=True)
+            if dump_format == "raw":
+                self._raw = open(os.path.join(dump_dir, "frames.rgb"), "wb")
+                self._raw_times = open(os.path.join(dump_dir, "frames.txt"), "w")
+        print(f"Simulated matrix {self.width}x{self.height} @ {refresh_hz} Hz"
+              + (f", dumping {dump_format} frames to {dump_dir}" if dump_dir else ""))
+
+    def CreateFrameCanvas(self):
+        return SimCanvas(self.width, self.height, self.brightness)
+
+    def SwapOnVSync(self, canvas, framerate_fraction=1):
+        period = framerate_fraction / float(self.refresh_hz)
+        now = time.monotonic()
+        ticks = int((now - self._epoch) / period) + 1
+        remain = self._epoch + ticks * period - now
+        if remain > 0:
+            time.sleep(remain)
+        with self._lock:
+            previous, self._front = self._front, canvas
+        self._present(canvas)
+        return previous
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        self._front.SetImage(image, offset_x, offset_y)
+        self._present(self._front)
+
+    def Clear(self):
+        self._front.Clear()
+        self._present(self._front)
+
+    @property
+    def front(self):
+        """The canvas currently 'on the panel'."""
+        return self._front
+
+    def _present(self, canvas):
+        ts = time.monotonic()
+        pixels = canvas.pixels.copy()
+        with self._lock:
+            self.frame_count += 1
+            n = self.frame_count
+            self.history.append((ts, canvas.brightness, pixels))
+        if self._raw is not None:
+            self._raw.write(pixels.tobytes())
+            self._raw_times.write(f"{ts:.6f} {canvas.brightness}\n")
+            self._raw.flush()
+            self._raw_times.flush()
+        elif self._dump_dir:
+            Image.fromarray(pixels, "RGB").save(os.path.join(self._dump_dir, f"frame_{n:06d}.png"))
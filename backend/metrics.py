@@ -0,0 +1,134 @@
+"""Low-overhead rolling timing metrics for the viewer.
+
+Recording a sample is a single store into a fixed-size ring under a lock;
+percentiles are only computed when someone asks (the ``stats`` control
+command), so this stays on in production.
+"""
+
+import os
+import threading
+import time
+
+# Samples kept per histogram; older ones roll off
+WINDOW = 512
+
+
+class Histogram:
+    """Rolling window of the last WINDOW samples, summarised as percentiles."""
+
+    def __init__(self, window=WINDOW):
+        self._lock = threading.Lock()
+        self._buf = [0.0] * window
+        self._count = 0
+        self.total = 0
+
+    def add(self, value):
+        with self._lock:
+            self._buf[self._count % len(self._buf)] = value
+            self._count += 1
+            self.total += 1
+
+    def time(self):
+        """Context manager recording the elapsed wall time of a block in ms."""
+        return _Timer(self)
+
+    def summary(self):
+        with self._lock:
+            n = min(self._count, len(self._buf))
+            samples = sorted(self._buf[:n])
+        if not samples:
+            return {"count": self.total}
+
+        def pct(p):
+            return round(samples[min(n - 1, int(p * n))], 3)
+
+        return {
+            "count": self.total,
+            "window": n,
+            "mean": round(sum(samples) / n, 3),
+            "p50": pct(0.50),
+            "p90": pct(0.90),
+            "p99": pct(0.99),
+            "max": round(samples[-1], 3),
+        }
+
+
+class _Timer:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.add((time.perf_counter() - self.start) * 1000.0)
+        return False
+
+
+class RateMeter:
+    """Events per second over the last WINDOW events."""
+
+    def __init__(self, window=WINDOW):
+        self._lock = threading.Lock()
+        self._times = [0.0] * window
+        self._count = 0
+
+    def tick(self):
+        with self._lock:
+            self._times[self._count % len(self._times)] = time.monotonic()
+            self._count += 1
+
+    def rate(self, horizon_s=5.0):
+        """Events per second within the last horizon_s seconds."""
+        now = time.monotonic()
+        with self._lock:
+            n = min(self._count, len(self._times))
+            recent = [t for t in self._times[:n] if now - t <= horizon_s]
+        if len(recent) < 2:
+            return 0.0
+        span = max(recent) - min(recent)
+        return round((len(recent) - 1) / span, 2) if span > 0 else 0.0
+
+
+def process_start_monotonic():
+    """
+    time.monotonic() value at which this process was started (from
+    /proc/self/stat on Linux), so startup timings include interpreter and
+    import time. Falls back to now.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, clock ticks since boot); comm may contain spaces
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - started
+        return time.monotonic() - max(0.0, age)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic()
+
+
+class StartupTimer:
+    """Milestones of a startup sequence, in ms since the process started."""
+
+    def __init__(self):
+        self._t0 = process_start_monotonic()
+        self.steps = []
+        self.first_pixel_ms = None
+
+    def _now_ms(self):
+        return round((time.monotonic() - self._t0) * 1000.0, 1)
+
+    def mark(self, step):
+        self.steps.append((step, self._now_ms()))
+
+    def first_pixel(self):
+        """Record time-to-first-pixel; only the first call counts."""
+        if self.first_pixel_ms is None:
+            self.first_pixel_ms = self._now_ms()
+            self.steps.append(("first_pixel", self.first_pixel_ms))
+
+    def summary(self):
+        return {"first_pixel_ms": self.first_pixel_ms, "steps": dict(self.steps)}
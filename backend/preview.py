@@ -0,0 +1,113 @@
+"""Delta-encoded preview stream of what the panel is showing.
+
+The viewer publishes every frame it blits to PREVIEW_RING (the live.py
+ring format). The server reads that ring independently, so preview
+clients cost the render loop nothing beyond one memcpy per frame.
+
+A stream is a sequence of messages, each an 18-byte big-endian header
+
+    b"LEDP", u8 type, u8 reserved, u16 width, u16 height, u32 seq,
+    u32 payload length
+
+followed by the payload, zlib-compressed:
+
+    KEY (0)        the full RGB24 frame
+    DELTA (1)      the frame minus the previous message's frame, byte by
+                   byte modulo 256; unchanged pixels are zero bytes and
+                   compress to almost nothing, and a fade changes every
+                   pixel by a similar amount, which compresses far better
+                   than an XOR
+    HEARTBEAT (2)  no payload
+
+The first frame message is always a KEY. Frames are only sent when they
+change, at most fps times per second. A HEARTBEAT goes out when the
+stream starts and whenever nothing was sent for HEARTBEAT_S, so a client
+that went away is noticed (the write fails and the stream ends) even
+while the panel is static or the viewer is down. A stream ends after
+max_s, or once the ring has been missing for RING_MISSING_S (viewer not
+running), so it can't hold a server thread for nothing; clients
+reconnect. The web UI's decoder is frontend/src/LivePreview.tsx.
+"""
+
+import io
+import struct
+import time
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from live import RingReader
+
+MAGIC = b"LEDP"
+KEY, DELTA, HEARTBEAT = 0, 1, 2
+
+# magic, type, reserved, width, height, seq, payload length
+_HEADER = struct.Struct(">4sBBHHII")
+
+MIMETYPE = "application/octet-stream"
+
+HEARTBEAT_S = 5.0
+RING_MISSING_S = 5.0
+
+# A 64x64 crossfade delta is ~4 KB at level 6 (a PNG of the frame ~8 KB),
+# ~10% less than at level 1 for about twice the (sub-millisecond) time
+_ZLIB_LEVEL = 6
+
+
+def encode_png(frame):
+    buf = io.BytesIO()
+    # Panel-sized frames are tiny; favour speed over size
+    Image.fromarray(frame, "RGB").save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def _message(kind, width, height, seq, payload=b""):
+    return _HEADER.pack(MAGIC, kind, 0, width, height, seq, len(payload)) + payload
+
+
+def stream(ring_path, width, height, fps, max_s,
+           heartbeat_s=HEARTBEAT_S, missing_s=RING_MISSING_S):
+    """
+    Yield encoded preview messages for the frames in ring_path for up to
+    max_s seconds. Intended as the body of a streaming HTTP response.
+    """
+    reader = RingReader(ring_path, width, height, skip_existing=False)
+    period = 1.0 / fps
+    prev = None
+    seq = 0
+    started = last_sent = last_open = time.monotonic()
+    next_due = started
+    yield _message(HEARTBEAT, width, height, seq)
+    while time.monotonic() - started < max_s:
+        now = time.monotonic()
+        if next_due > now:
+            time.sleep(next_due - now)
+        next_due = max(next_due + period, time.monotonic())
+
+        # Newest frame only; anything published in between is skipped
+        item = None
+        while True:
+            newer = reader.poll()
+            if newer is None:
+                break
+            item = newer
+        if reader.is_open:
+            last_open = time.monotonic()
+        elif time.monotonic() - last_open >= missing_s:
+            return
+
+        if item is not None and (prev is None or not np.array_equal(item[0], prev)):
+            frame = item[0]
+            seq += 1
+            if prev is None:
+                payload = zlib.compress(frame.tobytes(), _ZLIB_LEVEL)
+                yield _message(KEY, width, height, seq, payload)
+            else:
+                payload = zlib.compress(np.subtract(frame, prev).tobytes(), _ZLIB_LEVEL)
+                yield _message(DELTA, width, height, seq, payload)
+            prev = frame.copy()
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= heartbeat_s:
+            yield _message(HEARTBEAT, width, height, seq)
+            last_sent = time.monotonic()
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, send_from_directory, request
+from flask import Flask, Response, jsonify, send_from_directory, request
 import os
 import sys
 import subprocess
@@ -6,7 +6,6 @@ import logging
 from flask_cors import CORS, cross_origin
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
-import socket
 import configparser
 import threading
 import time
@@ -18,9 +17,15 @@ from dotenv import load_dotenv
 
 from config import (
     PROJECT_ROOT, DATA_DIR, IMAGE_FOLDER, CONFIG_DIR,
-    CONFIG_FILE, AUTH_FILE, ORDER_FILE, CTRL_SOCK,
-    ensure_directories,
+    CONFIG_FILE, AUTH_FILE, ORDER_FILE, CTRL_SOCK, MATRIX_SIZE, PREVIEW_RING,
+    BUNDLE_DIR, CURRENT_PLAYLIST, bundle_path, ensure_directories,
 )
+import bundle
+import ctl_protocol
+import frame_cache
+import preview
+from transitions import TRANSITIONS
+from catalog import Catalog
 
 # Load environment variables from project root
 _env_path = os.path.join(PROJECT_ROOT, '.env')
@@ -36,6 +41,20 @@ logger = logging.getLogger(__name__)
 WEB_APP_FOLDER = os.path.join(PROJECT_ROOT, "frontend", "dist")
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+# /api/status is unauthenticated and polled by the UI, so it serves the
+# viewer's status from a cache at most this old, refreshed with a short
+# timeout so a down or busy viewer never holds a worker for long
+STATUS_CACHE_S = 1.0
+STATUS_TIMEOUT_S = 0.25
+
+# Live preview frame rate cap; override with [preview] max_fps in config.ini
+PREVIEW_MAX_FPS = 10
+
+# Each preview stream holds a server thread: cap how many run at once and
+# how long one lasts before the client has to reconnect
+PREVIEW_MAX_CLIENTS = 2
+PREVIEW_MAX_STREAM_S = 600
+
 # JWT Configuration
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 if not JWT_SECRET_KEY:
@@ -60,23 +79,70 @@ cors = CORS(app)
 app.config['CORS_HEADERS'] = 'Content-Type'
 app.config['MAX_CONTENT_LENGTH'] = 4 * 1024 * 1024
 
+# Image listings and order, shared with the viewer
+image_catalog = Catalog(describe=True)
+
 # Thumbnail cache directory
 THUMB_DIR = os.path.join(IMAGE_FOLDER, ".thumbs")
 os.makedirs(THUMB_DIR, exist_ok=True)
 
 
-def send_ctl(cmd: bytes):
-    """Send command to LED control socket. Returns True on success."""
+# One persistent client for all viewer commands; requests are serialised
+ctl_client = ctl_protocol.ControlClient(CTRL_SOCK)
+
+
+def send_ctl_batch(cmds, atomic=True):
+    """
+    Send several commands to the viewer in one request.
+    Returns (reachable, errors): errors lists commands the viewer rejected.
+    """
+    names = ", ".join(c["cmd"] for c in cmds)
+    reply = ctl_client.request(cmds, atomic=atomic)
+    if reply is None:
+        logger.error(f"Viewer did not answer control request: {names}")
+        return False, []
+    errors = [r.get("error", r["cmd"]) for r in reply.get("results", []) if not r.get("ok")]
+    if reply.get("error"):
+        errors.append(reply["error"])
+    if errors:
+        logger.error(f"Viewer rejected control request ({names}): {'; '.join(errors)}")
+    else:
+        logger.info(f"Viewer applied: {names}")
+    return True, errors
+
+
+def send_ctl(name, value=None):
+    """Send one command to the viewer. Returns True once the viewer has applied it."""
+    reachable, errors = send_ctl_batch([ctl_protocol.command(name, value)], atomic=False)
+    return reachable and not errors
+
+
+# Separate client so status polls don't queue behind slow commands
+status_client = ctl_protocol.ControlClient(CTRL_SOCK, timeout=STATUS_TIMEOUT_S)
+_status_lock = threading.Lock()
+_status_cache = {"value": None, "at": 0.0}
+
+
+def cached_viewer_status():
+    """The viewer's status, at most STATUS_CACHE_S old; None if it is not answering."""
+    if time.monotonic() - _status_cache["at"] < STATUS_CACHE_S:
+        return _status_cache["value"]
+    if not _status_lock.acquire(blocking=False):
+        return _status_cache["value"]  # another request is refreshing it
     try:
-        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
-            s.settimeout(2.0)
-            s.connect(CTRL_SOCK)
-            s.send(cmd)
-        logger.info(f"Sent control command: {cmd.decode()}")
-        return True
-    except socket.error as e:
-        logger.error(f"Failed to send control command: {e}")
-        return False
+        _status_cache["value"] = status_client.query("status")
+        _status_cache["at"] = time.monotonic()
+    finally:
+        _status_lock.release()
+    return _status_cache["value"]
+
+
+def query_ctl(name, value=None):
+    """Run a query command on the viewer and return its value, or None."""
+    result = ctl_client.query(name, value)
+    if result is None:
+        logger.error(f"Failed to query viewer ({name})")
+    return result
 
 
 def load_config():
@@ -84,7 +150,9 @@ def load_config():
     config = configparser.ConfigParser()
     defaults = {
         "brightness": 50,
-        "hold_seconds": 20
+        "hold_seconds": 20,
+        "transition": "fade",
+        "transition_ms": 2700
     }
 
     if os.path.isfile(CONFIG_FILE):
@@ -92,12 +160,14 @@ def load_config():
         if "display" in config:
             return {
                 "brightness": config.getint("display", "brightness", fallback=defaults["brightness"]),
-                "hold_seconds": config.getint("display", "hold_seconds", fallback=defaults["hold_seconds"])
+                "hold_seconds": config.getint("display", "hold_seconds", fallback=defaults["hold_seconds"]),
+                "transition": config.get("display", "transition", fallback=defaults["transition"]),
+                "transition_ms": config.getint("display", "transition_ms", fallback=defaults["transition_ms"])
             }
     return defaults
 
 
-def save_config(brightness=None, hold_seconds=None):
+def save_config(brightness=None, hold_seconds=None, transition=None, transition_ms=None):
     """Save configuration to file."""
     config = configparser.ConfigParser()
 
@@ -113,10 +183,17 @@ def save_config(brightness=None, hold_seconds=None):
     if hold_seconds is not None:
         config["display"]["hold_seconds"] = str(hold_seconds)
 
+    if transition is not None:
+        config["display"]["transition"] = transition
+
+    if transition_ms is not None:
+        config["display"]["transition_ms"] = str(transition_ms)
+
     try:
         with open(CONFIG_FILE, "w") as f:
             config.write(f)
-        logger.info(f"Config saved: brightness={brightness}, hold_seconds={hold_seconds}")
+        logger.info(f"Config saved: brightness={brightness}, hold_seconds={hold_seconds}, "
+                    f"transition={transition}, transition_ms={transition_ms}")
     except OSError as e:
         logger.error(f"Failed to save config: {e}")
 
@@ -226,7 +303,7 @@ def schedule_thread():
             action = "on" if should_on else "off"
 
             if action != last_action:
-                send_ctl(action.encode())
+                send_ctl(action)
                 logger.info(f"Schedule: sent '{action}' (now={now.strftime('%H:%M')}, on={on_time}, off={off_time})")
                 last_action = action
 
@@ -295,6 +372,11 @@ def verify_token(token: str) -> dict:
         return None
 
 
+# Endpoints loaded by <img> tags, which can't send an Authorization header,
+# also accept the token as ?token=
+QUERY_TOKEN_ENDPOINTS = {"preview_snapshot"}
+
+
 def token_required(f):
     """Decorator to require valid JWT token for routes."""
     @wraps(f)
@@ -308,6 +390,8 @@ def token_required(f):
                 token = parts[1]
             else:
                 return jsonify({'error': 'Invalid token format'}), 401
+        elif request.endpoint in QUERY_TOKEN_ENDPOINTS:
+            token = request.args.get('token')
 
         if not token:
             return jsonify({'error': 'Authentication required'}), 401
@@ -528,16 +612,82 @@ def get_config():
 @app.route("/api/status", methods=["GET"])
 @cross_origin()
 def get_status():
-    """Get system status including overlay state."""
+    """Get system status including overlay state and what the viewer is showing."""
     overlay_status = is_overlay_enabled()
     config = load_config()
     return jsonify({
         "config": config,
+        "viewer": cached_viewer_status(),
         "overlay_enabled": overlay_status,
         "overlay_check_available": overlay_status is not None
     }), 200
 
 
+@app.route("/api/viewer/stats", methods=["GET"])
+@cross_origin()
+@token_required
+def viewer_stats():
+    """Get render timing metrics (fps, decode/blit times, frame lateness) from the viewer."""
+    stats = query_ctl("stats")
+    if stats is None:
+        return jsonify({"error": "Viewer may not be running"}), 503
+    return jsonify(stats), 200
+
+
+_preview_slots = threading.BoundedSemaphore(PREVIEW_MAX_CLIENTS)
+
+
+def preview_max_fps():
+    config = configparser.ConfigParser()
+    try:
+        config.read(CONFIG_FILE)
+        return max(1, config.getint("preview", "max_fps", fallback=PREVIEW_MAX_FPS))
+    except (configparser.Error, ValueError):
+        return PREVIEW_MAX_FPS
+
+
+@app.route("/api/preview/stream", methods=["GET"])
+@cross_origin()
+@token_required
+def preview_stream():
+    """
+    Stream what the panel is showing as zlib-compressed key frames and
+    deltas (see preview.py). Optional ?fps= is capped at the configured
+    maximum.
+    """
+    max_fps = preview_max_fps()
+    try:
+        fps = min(max_fps, max(1, int(request.args.get("fps", max_fps))))
+    except ValueError:
+        return jsonify({"error": "fps must be an integer"}), 400
+    if not _preview_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many preview streams open"}), 503
+    width, height = MATRIX_SIZE
+    resp = Response(
+        preview.stream(PREVIEW_RING, width, height, fps, PREVIEW_MAX_STREAM_S),
+        mimetype=preview.MIMETYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs when the stream ends or the client goes away
+    resp.call_on_close(_preview_slots.release)
+    return resp
+
+
+@app.route("/api/preview.png", methods=["GET"])
+@cross_origin()
+@token_required
+def preview_snapshot():
+    """The frame currently on the panel as a PNG at panel resolution."""
+    from live import RingReader
+
+    width, height = MATRIX_SIZE
+    item = RingReader(PREVIEW_RING, width, height, skip_existing=False).poll()
+    if item is None:
+        return jsonify({"error": "No preview available — viewer may not be running"}), 503
+    return Response(preview.encode_png(item[0]), mimetype="image/png",
+                    headers={"Cache-Control": "no-cache"})
+
+
 # =============================================================================
 # Image Management Endpoints
 # =============================================================================
@@ -545,13 +695,14 @@ def get_status():
 @app.route("/images", methods=["GET"])
 @cross_origin()
 def list_images():
-    """Return list of image filenames."""
+    """Return list of image filenames in display order (?details=1 for catalog metadata)."""
     try:
-        image_files = [
-            f for f in os.listdir(IMAGE_FOLDER)
-            if f.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".webp"))
-        ]
-        return jsonify({"images": image_files})
+        etag = image_catalog.etag()
+        if request.args.get("details"):
+            resp = jsonify({"images": image_catalog.describe()})
+        else:
+            resp = jsonify({"images": image_catalog.filenames()})
+        return _conditional(resp, etag)
     except Exception as e:
         logger.error(f"Failed to list images: {e}")
         return jsonify({"error": "Failed to list images", "images": []}), 500
@@ -564,6 +715,14 @@ def serve_image(filename):
     return send_from_directory(IMAGE_FOLDER, filename)
 
 
+def _conditional(resp, etag):
+    """Tag resp with etag and turn it into a 304 if the client's copy is current."""
+    if etag:
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+
 def _invalidate_thumbnail(filename):
     """Remove cached thumbnail for a file."""
     thumb_path = os.path.join(THUMB_DIR, filename + ".png")
@@ -592,8 +751,7 @@ def serve_thumbnail(filename):
 
         # Case-insensitive match fallback
         if not os.path.exists(file_path):
-            files = os.listdir(IMAGE_FOLDER)
-            match = next((f for f in files if f.lower() == decoded_filename.lower()), None)
+            match = image_catalog.find(decoded_filename)
             if match:
                 file_path = os.path.join(IMAGE_FOLDER, match)
                 decoded_filename = match
@@ -663,6 +821,8 @@ def delete_images():
         except Exception as e:
             errors[filename] = str(e)
 
+    if deleted:
+        image_catalog.refresh(force=True)
     return jsonify({"deleted": deleted, "errors": errors}), 200
 
 
@@ -670,18 +830,9 @@ def delete_images():
 @cross_origin()
 def get_image_order():
     """Get the current image display order."""
-    import json
     try:
-        if os.path.exists(ORDER_FILE):
-            with open(ORDER_FILE, 'r') as f:
-                order = json.load(f)
-            return jsonify({"order": order}), 200
-        else:
-            image_files = sorted([
-                f for f in os.listdir(IMAGE_FOLDER)
-                if f.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".webp"))
-            ])
-            return jsonify({"order": image_files}), 200
+        etag = image_catalog.etag()
+        return _conditional(jsonify({"order": image_catalog.filenames()}), etag)
     except Exception as e:
         logger.error(f"Failed to get image order: {e}")
         return jsonify({"error": "Failed to get image order"}), 500
@@ -705,16 +856,14 @@ def set_image_order():
     if not isinstance(order, list):
         return jsonify({'error': 'Order must be an array of filenames'}), 400
 
-    existing_files = set(
-        f for f in os.listdir(IMAGE_FOLDER)
-        if f.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".webp"))
-    )
+    existing_files = image_catalog.filenames()
+    existing_set = set(existing_files)
 
-    invalid_files = [f for f in order if f not in existing_files]
+    invalid_files = [f for f in order if f not in existing_set]
     if invalid_files:
         logger.warning(f"Order contains non-existent files: {invalid_files}")
 
-    valid_order = [f for f in order if f in existing_files]
+    valid_order = [f for f in order if f in existing_set]
 
     for f in existing_files:
         if f not in valid_order:
@@ -725,7 +874,7 @@ def set_image_order():
             json.dump(valid_order, f, indent=2)
         logger.info(f"Image order saved: {len(valid_order)} images")
 
-        send_ctl(b"reload")
+        request_compile(reload=True)
 
         return jsonify({
             'message': 'Order saved successfully',
@@ -778,6 +927,9 @@ def upload_image():
             file.save(save_path)
             logger.info(f"Image uploaded: {filename}")
 
+        image_catalog.refresh(force=True)
+        request_compile(precache=[save_path])
+
         return jsonify({
             'message': 'File uploaded successfully',
             'filename': filename,
@@ -811,7 +963,7 @@ def set_brightness():
     except ValueError:
         return jsonify({'error': 'Brightness must be an integer'}), 400
 
-    success = send_ctl(f"brightness:{brightness}".encode())
+    success = send_ctl("brightness", brightness)
     save_config(brightness=brightness)
 
     if not success:
@@ -839,7 +991,7 @@ def set_hold_seconds():
     except ValueError:
         return jsonify({'error': 'hold_seconds must be an integer'}), 400
 
-    success = send_ctl(f"hold:{hold_seconds}".encode())
+    success = send_ctl("hold", hold_seconds)
     save_config(hold_seconds=hold_seconds)
 
     if not success:
@@ -852,21 +1004,29 @@ def set_hold_seconds():
 @cross_origin()
 @token_required
 def apply_changes():
-    """Apply all pending changes (brightness, hold_seconds, deletions) then reload viewer."""
+    """
+    Apply all pending changes (brightness, hold_seconds, transition,
+    deletions) then reload the viewer.
+
+    The settings go to the viewer first, as one atomic batch. The playlist
+    reload is deliberately not part of that batch: it has to wait for the
+    debounced background recompile (see request_compile()), so the viewer
+    may show the new brightness and hold with the old playlist for a
+    moment. Putting the reload back into the batch would reload before the
+    bundle is rebuilt, or make this request wait for the compile.
+    """
     if not request.is_json:
         return jsonify({'error': 'Request must be JSON'}), 400
 
     data = request.get_json()
     errors = []
-    viewer_unreachable = False
+    settings = {}
 
     if 'brightness' in data:
         try:
             brightness = int(data['brightness'])
             if 1 <= brightness <= 100:
-                if not send_ctl(f"brightness:{brightness}".encode()):
-                    viewer_unreachable = True
-                save_config(brightness=brightness)
+                settings['brightness'] = brightness
             else:
                 errors.append("Brightness must be between 1 and 100")
         except (ValueError, TypeError):
@@ -876,14 +1036,32 @@ def apply_changes():
         try:
             hold_seconds = int(data['hold_seconds'])
             if 1 <= hold_seconds <= 3600:
-                if not send_ctl(f"hold:{hold_seconds}".encode()):
-                    viewer_unreachable = True
-                save_config(hold_seconds=hold_seconds)
+                settings['hold_seconds'] = hold_seconds
             else:
                 errors.append("hold_seconds must be between 1 and 3600")
         except (ValueError, TypeError):
             errors.append("Invalid hold_seconds value")
 
+    if 'transition' in data:
+        transition = data['transition']
+        if transition in TRANSITIONS:
+            settings['transition'] = transition
+        else:
+            errors.append(f"transition must be one of {', '.join(TRANSITIONS)}")
+
+    if 'transition_ms' in data:
+        try:
+            transition_ms = int(data['transition_ms'])
+            if 100 <= transition_ms <= 10000:
+                settings['transition_ms'] = transition_ms
+            else:
+                errors.append("transition_ms must be between 100 and 10000")
+        except (ValueError, TypeError):
+            errors.append("Invalid transition_ms value")
+
+    if settings:
+        save_config(**settings)
+
     deleted = []
     abs_image_folder = os.path.abspath(IMAGE_FOLDER)
     if 'delete_images' in data and isinstance(data['delete_images'], list):
@@ -897,8 +1075,18 @@ def apply_changes():
                 except Exception as e:
                     errors.append(f"Failed to delete {filename}: {str(e)}")
 
-    if not send_ctl(b"reload"):
-        viewer_unreachable = True
+    # Settings reach the viewer now, as one atomic batch; the playlist is
+    # recompiled in the background and the viewer reloaded after that (see
+    # the docstring: keep the reload out of this batch)
+    ctl_names = {'hold_seconds': 'hold'}
+    cmds = [ctl_protocol.command(ctl_names.get(k, k), v) for k, v in settings.items()]
+    if cmds:
+        reachable, ctl_errors = send_ctl_batch(cmds, atomic=True)
+        errors.extend(f"Viewer rejected change: {e}" for e in ctl_errors)
+    else:
+        reachable = cached_viewer_status() is not None
+    viewer_unreachable = not reachable
+    request_compile(reload=True)
 
     status_code = 200
     result = {
@@ -918,7 +1106,7 @@ def apply_changes():
 @token_required
 def turn_on():
     """Turn on the LED display."""
-    success = send_ctl(b"on")
+    success = send_ctl("on")
     if success:
         return jsonify({"status": "success", "action": "on"}), 200
     return jsonify({"status": "error", "action": "on", "message": "Viewer may not be running"}), 503
@@ -929,7 +1117,7 @@ def turn_on():
 @token_required
 def turn_off():
     """Turn off the LED display."""
-    success = send_ctl(b"off")
+    success = send_ctl("off")
     if success:
         return jsonify({"status": "success", "action": "off"}), 200
     return jsonify({"status": "error", "action": "off", "message": "Viewer may not be running"}), 503
@@ -1033,6 +1221,156 @@ def set_schedule():
     }), 200
 
 
+# =============================================================================
+# Compiled Playlists
+# =============================================================================
+
+_PLAYLIST_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+
+def compile_playlist(name=CURRENT_PLAYLIST):
+    """
+    Compile the image folder, in display order, into the named playlist
+    bundle for the viewer. CURRENT_PLAYLIST tracks the folder; any other
+    name is a self-contained snapshot. Returns True on success.
+    """
+    snapshot = name != CURRENT_PLAYLIST
+    try:
+        # Also picks up files replaced in place, which leave the folder mtime alone
+        image_catalog.refresh(force=True)
+        paths = image_catalog.paths()
+        compiled = bundle.compile_bundle(
+            paths, MATRIX_SIZE, bundle_path(name),
+            folder=None if snapshot else IMAGE_FOLDER,
+            order_file=None if snapshot else ORDER_FILE,
+        )
+        logger.info(f"Playlist '{name}' compiled: {compiled} of {len(paths)} images bundled")
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to compile playlist '{name}': {e}")
+        return False
+
+
+# Compiles requested by the image and order endpoints run on one background
+# worker, after COMPILE_DEBOUNCE_S without a new request, so the requests
+# of one "apply" in the web UI make a single compile and viewer reload.
+# Frame cache pre-decodes for uploads go through the same worker.
+COMPILE_DEBOUNCE_S = 0.5
+
+_compile_cond = threading.Condition()
+_compile_state = {"compile": False, "reload": False, "precache": [], "at": 0.0, "worker": None}
+
+
+def request_compile(reload=False, precache=None):
+    """
+    Queue a compile of the current playlist (reloading the viewer after it
+    with reload), or with precache only a frame cache decode of those
+    paths. Returns at once.
+    """
+    with _compile_cond:
+        state = _compile_state
+        if precache:
+            state["precache"].extend(precache)
+        else:
+            state["compile"] = True
+        state["reload"] = state["reload"] or reload
+        state["at"] = time.monotonic()
+        if state["worker"] is None:
+            state["worker"] = threading.Thread(target=_compile_worker, daemon=True)
+            state["worker"].start()
+        _compile_cond.notify_all()
+
+
+def _compile_worker():
+    state = _compile_state
+    while True:
+        with _compile_cond:
+            while not (state["compile"] or state["precache"]):
+                _compile_cond.wait()
+            while True:
+                remaining = state["at"] + COMPILE_DEBOUNCE_S - time.monotonic()
+                if remaining <= 0:
+                    break
+                _compile_cond.wait(remaining)
+            do_compile, reload, precache = state["compile"], state["reload"], state["precache"]
+            state.update(compile=False, reload=False, precache=[])
+
+        if do_compile:
+            # Decodes anything not in the frame cache yet, uploads included
+            compile_playlist()
+        else:
+            for path in precache:
+                try:
+                    frame_cache.get_or_decode(path, MATRIX_SIZE)
+                    logger.info(f"Frame cache populated: {os.path.basename(path)}")
+                except Exception as e:
+                    logger.warning(f"Failed to pre-decode {path}: {e}")
+        if reload:
+            send_ctl("reload")
+
+
+def list_playlist_names():
+    try:
+        return sorted(f[:-len(".bundle")] for f in os.listdir(BUNDLE_DIR) if f.endswith(".bundle"))
+    except OSError:
+        return []
+
+
+@app.route("/api/playlists", methods=["GET"])
+@cross_origin()
+@token_required
+def list_playlists():
+    """List saved playlists and the one the viewer is playing."""
+    viewer = query_ctl("status")
+    return jsonify({
+        "playlists": [n for n in list_playlist_names() if n != CURRENT_PLAYLIST],
+        "active": viewer.get("playlist") if viewer else None,
+    }), 200
+
+
+@app.route("/api/playlists", methods=["POST"])
+@cross_origin()
+@token_required
+def save_playlist():
+    """Save the current image order as a named playlist snapshot."""
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    if not isinstance(name, str) or not _PLAYLIST_NAME_RE.match(name) or name == CURRENT_PLAYLIST:
+        return jsonify({'error': 'name must be 1-32 letters, digits, - or _ (and not "current")'}), 400
+    if not compile_playlist(name):
+        return jsonify({'error': 'Failed to save playlist. Filesystem may be read-only.'}), 500
+    return jsonify({'message': f"Playlist '{name}' saved", 'name': name}), 200
+
+
+@app.route("/api/playlists/<name>/activate", methods=["POST"])
+@cross_origin()
+@token_required
+def activate_playlist(name):
+    """Switch the viewer to a saved playlist, or back to the image folder with "current"."""
+    if name != CURRENT_PLAYLIST and name not in list_playlist_names():
+        return jsonify({'error': 'Playlist not found'}), 404
+    if not send_ctl("playlist", name):
+        return jsonify({'error': 'Viewer may not be running'}), 503
+    return jsonify({'message': f"Playing playlist '{name}'", 'active': name}), 200
+
+
+@app.route("/api/playlists/<name>", methods=["DELETE"])
+@cross_origin()
+@token_required
+def delete_playlist(name):
+    """Delete a saved playlist."""
+    if name == CURRENT_PLAYLIST or name not in list_playlist_names():
+        return jsonify({'error': 'Playlist not found'}), 404
+    viewer = query_ctl("status")
+    if viewer and viewer.get("playlist") == name:
+        send_ctl("playlist", CURRENT_PLAYLIST)
+    try:
+        os.unlink(bundle_path(name))
+    except OSError as e:
+        return jsonify({'error': f'Failed to delete playlist: {e}'}), 500
+    return jsonify({'message': f"Playlist '{name}' deleted"}), 200
+
+
 # =============================================================================
 # Main Entry Point
 # =============================================================================
@@ -0,0 +1,74 @@
+"""Split per-frame array work into row bands processed on several cores.
+
+The per-pixel numpy kernels in fade.py and transitions.py (np.take,
+elementwise float math) release the GIL, so on a large wall the bands of
+one frame can run on different cores with plain threads. Small frames are
+processed inline: for a single 64x64 panel the hand-off costs more than it
+saves.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Frames with fewer pixels than this are never split
+TILE_MIN_PIXELS = 64 * 64 * 4
+
+# Bands are at least this many rows tall
+TILE_MIN_ROWS = 8
+
+
+class TilePool:
+    def __init__(self, workers=1):
+        self.workers = max(1, workers)
+        # The calling thread processes one band itself
+        self._executor = ThreadPoolExecutor(self.workers - 1) if self.workers > 1 else None
+
+    def _bands(self, height):
+        n = min(self.workers, max(1, height // TILE_MIN_ROWS))
+        step = -(-height // n)
+        return [slice(y, min(height, y + step)) for y in range(0, height, step)]
+
+    def run(self, fn, *arrays):
+        """
+        Call fn(*bands) for horizontal bands of arrays (all sliced along
+        axis 0; non-array arguments are passed through unchanged).
+        """
+        first = next(a for a in arrays if hasattr(a, "shape"))
+        height = first.shape[0]
+        pixels = height * (first.shape[1] if first.ndim > 1 else 1)
+        if self._executor is None or pixels < TILE_MIN_PIXELS:
+            fn(*arrays)
+            return
+
+        def band(rows):
+            return [a[rows] if hasattr(a, "shape") and a.ndim and a.shape[0] == height else a
+                    for a in arrays]
+
+        bands = self._bands(height)
+        futures = [self._executor.submit(fn, *band(rows)) for rows in bands[1:]]
+        fn(*band(bands[0]))
+        for f in futures:
+            f.result()
+
+
+_pool = TilePool(1)
+_pool_lock = threading.Lock()
+
+
+def configure(cores):
+    """Use up to len(cores) threads (capped at the CPUs this process may run on)."""
+    global _pool
+    try:
+        available = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        available = os.cpu_count() or 1
+    workers = max(1, min(len(cores or ()), available))
+    with _pool_lock:
+        _pool = TilePool(workers)
+    return workers
+
+
+def run(fn, *arrays):
+    """Run fn over row bands of arrays on the configured pool."""
+    _pool.run(fn, *arrays)
@@ -0,0 +1,158 @@
+"""Image-to-image transitions, computed ahead of time.
+
+Every transition is a sequence of frames blending image A into image B in
+linear light, driven by a per-pixel alpha map: a crossfade uses one alpha
+for the whole frame, a wipe sweeps a soft edge across the columns, and a
+dissolve switches pixels in a fixed random order. "fade" is the classic
+fade-out to black and fade-in.
+
+Frames are rendered into one (N, H, W, 3) array, normally by a
+TransitionPlanner thread while the current image is still being held, so
+playing the transition costs only blits.
+"""
+
+import threading
+
+import numpy as np
+
+import tiles
+from fade import GAMMA, scale_perceptual_into, smoothstep
+
+TRANSITIONS = ("fade", "crossfade", "wipe", "dissolve")
+
+# Width of the soft edge for wipe/dissolve, as a fraction of the transition
+EDGE = 0.2
+
+_TO_LIN = ((np.arange(256, dtype=np.float32) / 255.0) ** GAMMA).astype(np.float32)
+_ENC_SIZE = 65536
+_FROM_LIN = np.clip(
+    (np.linspace(0.0, 1.0, _ENC_SIZE, dtype=np.float32) ** (1.0 / GAMMA)) * 255.0 + 0.5, 0, 255
+).astype(np.uint8)
+
+
+def _encode(lin, out):
+    """Linear-light float32 [0, 1] -> gamma-encoded uint8, written into out."""
+    idx = (lin * (_ENC_SIZE - 1) + 0.5).astype(np.uint16)
+    np.take(_FROM_LIN, idx, out=out, mode="clip")
+
+
+def _threshold_map(kind, shape):
+    """Per-pixel switch time in [0, 1] for wipe/dissolve, shaped (H, W, 1)."""
+    h, w = shape[:2]
+    if kind == "wipe":
+        thr = np.broadcast_to(np.linspace(0.0, 1.0, w, dtype=np.float32), (h, w))
+    else:
+        thr = np.random.default_rng(0).random((h, w), dtype=np.float32)
+    return thr[..., None]
+
+
+def _fade_through_black(a, b, steps, black_frames):
+    half = max(1, steps // 2)
+    n = 2 * (half + 1) + black_frames
+    frames = np.zeros((n,) + a.shape, dtype=np.uint8)
+    for i in range(half + 1):
+        s = smoothstep(i / float(half))
+        scale_perceptual_into(a, 1.0 - s, frames[i])
+        scale_perceptual_into(b, s, frames[half + 1 + black_frames + i])
+    return frames
+
+
+def _blend_into(t, lin_a, diff, thr, mix, out):
+    """Write the frame at progress t (0-1) of a -> b into out, for one band of rows."""
+    if thr is None:
+        alpha = t
+    else:
+        alpha = np.clip((t * (1.0 + EDGE) - thr) / EDGE, 0.0, 1.0)
+    np.multiply(diff, alpha, out=mix)
+    mix += lin_a
+    _encode(mix, out)
+
+
+def render_transition(kind, a, b, steps, black_frames=0):
+    """
+    Return an (N, H, W, 3) uint8 array of frames taking image a to image b.
+    steps is the number of frame intervals; black_frames pads the middle of
+    a "fade" with black.
+    """
+    a = np.asarray(a, dtype=np.uint8)
+    b = np.asarray(b, dtype=np.uint8)
+    steps = max(1, steps)
+    if kind == "fade":
+        return _fade_through_black(a, b, steps, black_frames)
+
+    lin_a = _TO_LIN[a]
+    lin_b = _TO_LIN[b]
+    diff = lin_b - lin_a
+    thr = None if kind == "crossfade" else _threshold_map(kind, a.shape)
+
+    frames = np.empty((steps + 1,) + a.shape, dtype=np.uint8)
+    mix = np.empty(a.shape, dtype=np.float32)
+    for i in range(steps + 1):
+        t = smoothstep(i / float(steps))
+        tiles.run(lambda *band: _blend_into(t, *band), lin_a, diff, thr, mix, frames[i])
+    # End frames exactly match the source images
+    frames[0] = a
+    frames[-1] = b
+    return frames
+
+
+class TransitionPlanner:
+    """
+    Precompute the next transition on a background thread.
+
+    prepare(key, ...) starts rendering; take(key) returns the frames,
+    waiting for an in-flight render with the same key or rendering
+    synchronously if a different transition was prepared.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._key = None
+        self._frames = None
+        self._busy = False
+
+    def prepare(self, key, kind, a, load_b, steps, black_frames=0):
+        """
+        Render in the background. load_b() is called on the worker thread
+        and must return image b, or None to abandon the transition.
+        """
+        with self._cond:
+            if key == self._key:
+                return
+            self._key = key
+            self._frames = None
+            self._busy = True
+
+        def worker():
+            frames = None
+            try:
+                b = load_b()
+                if b is not None:
+                    frames = render_transition(kind, a, b, steps, black_frames)
+            except Exception as e:
+                print(f"Transition precompute failed: {e}")
+            with self._cond:
+                if self._key == key:
+                    self._frames = frames
+                    self._busy = False
+                    self._cond.notify_all()
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def clear(self):
+        """Forget any prepared transition (e.g. because one of its images changed on disk)."""
+        with self._cond:
+            self._key, self._frames = None, None
+            self._busy = False
+            self._cond.notify_all()
+
+    def take(self, key, kind, a, b, steps, black_frames=0):
+        with self._cond:
+            if key == self._key:
+                while self._busy:
+                    self._cond.wait()
+                frames = self._frames
+                self._key, self._frames = None, None
+                if frames is not None:
+                    return frames
+        return render_transition(kind, a, b, steps, black_frames)
@@ -2,19 +2,34 @@
 import time
 import sys
 import os
+import signal
 import socket
 import threading
 import configparser
 import json
+from collections import OrderedDict, namedtuple
 
 import numpy as np
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from PIL import Image
 
 from config import (
     PROJECT_ROOT, DATA_DIR, IMAGE_FOLDER, CONFIG_DIR,
-    CONFIG_FILE, ORDER_FILE, CTRL_SOCK,
+    CONFIG_FILE, ORDER_FILE, CTRL_SOCK, MATRIX_GEOMETRY, LIVE_SOCK, LIVE_RING, PREVIEW_RING,
+    CURRENT_PLAYLIST, VIEWER_STATE_FILE, LAST_FRAME_FILE, bundle_path,
 )
+import bundle
+import catalog
+import ctl_protocol
+import decoder as decoder_process
+import frame_cache
+import live
+import matrix_backend
+import tiles
+import transitions
+import warmup as warmup_pool
+from frame_clock import FrameClock, RESYNC_THRESHOLD_S
+from metrics import Histogram, RateMeter, StartupTimer
+from fade import fade_buffer, scale_perceptual_into, smoothstep
 
 # =============================================================================
 # Configuration Constants
@@ -23,15 +38,52 @@ from config import (
 # Maximum hardware brightness (100% UI = MAX_BRIGHTNESS% hardware)
 MAX_BRIGHTNESS = 75
 
-# CPU affinity: cores for the viewer process (leave core 0 for server)
-VIEWER_CPU_CORES = [1, 2, 3]
+# CPU affinity: cores for the viewer process (leave core 0 for server).
+# Core 3 is the one scripts/setup_isolcpus.sh reserves for the render loop.
+VIEWER_CPU_CORES = [2, 3]
+
+# Cores for the image decoder process (see decoder.py); None decodes on
+# viewer threads instead
+DECODER_CPU_CORES = [1]
+
+# Cores for the playlist warm-up pool (see warmup.py), which runs after boot
+# and after reloads that add or change images; None disables warm-up. There
+# is no spare core on a Pi, so its workers share the server's and the
+# decoder's cores at WARMUP_NICE
+WARMUP_CPU_CORES = [0, 1]
 
 # Fade transition settings — tune these for Pi Zero W 2 performance
 FADE_STEPS = 40
 FADE_FPS = 30
 BLACK_PAUSE_S = 0.05
 
-GAMMA = 2.2
+# Image-to-image transition defaults (overridable in config.ini [display]
+# and via the control socket): one of transitions.TRANSITIONS. The default
+# is the original fade through black, ~40 steps out and 40 in at FADE_FPS
+DEFAULT_TRANSITION = "fade"
+DEFAULT_TRANSITION_DURATION_MS = 2700
+
+# Look-ahead decoding: playlist entries kept decoded around the current one
+PREFETCH_AHEAD = 2
+PREFETCH_BEHIND = 1
+
+# Floor for GIF frame durations (some GIFs declare 0 ms)
+GIF_MIN_FRAME_MS = 20
+
+# Uncached GIFs stream through a ring of this many decoded frames; they are
+# kept fully decoded (and written to the frame cache) only if their compact
+# palette-indexed form fits in GIF_CACHE_BUDGET_BYTES (overridable in
+# config.ini [cache] gif_mb)
+GIF_STREAM_RING_FRAMES = 24
+GIF_CACHE_BUDGET_BYTES = 4 * 1024 * 1024
+
+# Live input falls back to the playlist after this long without a frame
+LIVE_TIMEOUT_S = 2.0
+
+# Decoded images kept in memory across playlist cycles, least recently used
+# evicted first (overridable in config.ini [cache] memory_mb). A Pi Zero 2 W
+# has 512 MB; 48 MB holds ~4000 stills at 64x64 or ~300 at 256x192
+DECODED_CACHE_BYTES = 48 * 1024 * 1024
 
 
 def set_cpu_affinity():
@@ -45,10 +97,6 @@ def set_cpu_affinity():
         print(f"Could not set CPU affinity: {e}")
 
 
-# Set CPU affinity early
-set_cpu_affinity()
-
-
 def scale_brightness(ui_value: int) -> int:
     """Scale UI brightness (1-100) to hardware brightness (1-MAX_BRIGHTNESS)."""
     return max(1, int(ui_value * MAX_BRIGHTNESS / 100))
@@ -57,10 +105,12 @@ def scale_brightness(ui_value: int) -> int:
 def load_config():
     brightness = 75
     hold_seconds = 30
+    transition = DEFAULT_TRANSITION
+    transition_duration_ms = DEFAULT_TRANSITION_DURATION_MS
     config = configparser.ConfigParser()
     if not os.path.isfile(CONFIG_FILE):
         print(f"Config file '{CONFIG_FILE}' not found. Using defaults.")
-        return brightness, hold_seconds
+        return brightness, hold_seconds, transition, transition_duration_ms
 
     try:
         config.read(CONFIG_FILE)
@@ -85,46 +135,176 @@ def load_config():
                 except ValueError:
                     print(f"Invalid hold_seconds in config, using default {hold_seconds}")
 
+            if "transition" in config["display"]:
+                t = config["display"]["transition"].strip().lower()
+                if t in transitions.TRANSITIONS:
+                    transition = t
+                else:
+                    print(f"Unknown transition '{t}' in config, using default {transition}")
+
+            if "transition_ms" in config["display"]:
+                try:
+                    ms = int(config["display"]["transition_ms"])
+                    if 100 <= ms <= 10000:
+                        transition_duration_ms = ms
+                    else:
+                        print(f"transition_ms out of range (100-10000), using default {transition_duration_ms}")
+                except ValueError:
+                    print(f"Invalid transition_ms in config, using default {transition_duration_ms}")
+
     except Exception as e:
         print(f"Error reading config file: {e}. Using defaults.")
 
-    return brightness, hold_seconds
+    return brightness, hold_seconds, transition, transition_duration_ms
+
+
+def load_live_config():
+    """
+    Read the [live] section of config.ini: enabled (default true), udp
+    (comma-separated host:port list, default none), e131_universe and
+    timeout_s.
+    """
+    settings = {"enabled": True, "udp": [], "e131_universe": 1, "timeout_s": LIVE_TIMEOUT_S}
+    config = configparser.ConfigParser()
+    try:
+        config.read(CONFIG_FILE)
+        if "live" not in config:
+            return settings
+        section = config["live"]
+        settings["enabled"] = section.getboolean("enabled", fallback=True)
+        settings["e131_universe"] = section.getint("e131_universe", fallback=1)
+        settings["timeout_s"] = section.getfloat("timeout_s", fallback=LIVE_TIMEOUT_S)
+        for item in section.get("udp", "").split(","):
+            if item.strip():
+                host, _, port = item.strip().rpartition(":")
+                settings["udp"].append((host or "127.0.0.1", int(port)))
+    except (configparser.Error, ValueError) as e:
+        print(f"Error reading [live] config: {e}. Using defaults.")
+    return settings
+
+
+def load_cache_config():
+    """
+    Read the [cache] section of config.ini: memory_mb for the decoded-image
+    cache and gif_mb for animations kept fully decoded. Returns both in bytes.
+    """
+    budgets = {"memory_mb": DECODED_CACHE_BYTES, "gif_mb": GIF_CACHE_BUDGET_BYTES}
+    config = configparser.ConfigParser()
+    try:
+        config.read(CONFIG_FILE)
+        if "cache" in config:
+            for key, default in budgets.items():
+                if key not in config["cache"]:
+                    continue
+                mb = config["cache"].getfloat(key)
+                if mb >= 0:
+                    budgets[key] = int(mb * 1024 * 1024)
+                else:
+                    print(f"cache {key} must be >= 0, using default {default // (1024 * 1024)}")
+    except (configparser.Error, ValueError) as e:
+        print(f"Error reading [cache] config: {e}. Using defaults.")
+    return budgets["memory_mb"], budgets["gif_mb"]
 
 
 # =============================================================================
 # Thread-safe state
 # =============================================================================
 
+# All control state lives behind one condition variable. Writers (the control
+# thread) bump state_version and notify, so the render loop can sleep until
+# its next frame deadline or a command arrives, whichever comes first. Reads
+# of single values are atomic in CPython and don't take the lock.
+state_cond = threading.Condition()
+state_version = 0
 isRunning = True
-lock = threading.Lock()
-hold_seconds_lock = threading.Lock()
 current_hold_seconds = 30
+current_transition = DEFAULT_TRANSITION
+current_transition_duration_ms = DEFAULT_TRANSITION_DURATION_MS
+current_brightness = 50
 reload_requested = False
-reload_lock = threading.Lock()
+nav_request = None
+now_showing = (None, 0, 0)  # (image name, playlist index, playlist length)
+playlist_name = CURRENT_PLAYLIST  # compiled playlist to play (see bundle.py)
+
+
+def _state_changed():
+    """Wake anyone waiting on control state. Caller must hold state_cond."""
+    global state_version
+    state_version += 1
+    state_cond.notify_all()
+
+
+def notify_state_change():
+    with state_cond:
+        _state_changed()
+
+
+def wait_for_state_change(seen, deadline=None):
+    """
+    Block until state_version moves past `seen` or the time.monotonic()
+    deadline passes (None waits indefinitely).
+    Returns the new version, or None if the deadline was reached first.
+    """
+    with state_cond:
+        while state_version == seen:
+            if deadline is None:
+                state_cond.wait()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            state_cond.wait(remaining)
+        return state_version
 
 
 def get_hold_seconds():
-    with hold_seconds_lock:
-        return current_hold_seconds
+    return current_hold_seconds
 
 
 def set_hold_seconds_value(value):
     global current_hold_seconds
-    with hold_seconds_lock:
+    with state_cond:
         current_hold_seconds = value
+        _state_changed()
     print(f"Hold seconds updated to {value}")
 
 
+def get_transition():
+    """Return (kind, duration_ms) for image-to-image transitions."""
+    return current_transition, current_transition_duration_ms
+
+
+def set_transition_value(kind=None, duration_ms=None):
+    global current_transition, current_transition_duration_ms
+    with state_cond:
+        if kind is not None:
+            current_transition = kind
+        if duration_ms is not None:
+            current_transition_duration_ms = duration_ms
+        _state_changed()
+    print(f"Transition updated to {current_transition} ({current_transition_duration_ms} ms)")
+
+
+def set_playlist(name):
+    """Switch to another compiled playlist; takes effect as a reload."""
+    global playlist_name
+    with state_cond:
+        playlist_name = name
+    print(f"Playlist set to {name}")
+    request_reload()
+
+
 def request_reload():
     global reload_requested
-    with reload_lock:
+    with state_cond:
         reload_requested = True
+        _state_changed()
     print("Reload requested")
 
 
 def should_reload():
     global reload_requested
-    with reload_lock:
+    with state_cond:
         if reload_requested:
             reload_requested = False
             return True
@@ -133,246 +313,757 @@ def should_reload():
 
 def peek_reload():
     """Check if reload is requested without consuming the flag."""
-    with reload_lock:
-        return reload_requested
+    return reload_requested
+
+
+def request_nav(action, target=None):
+    """Queue a manual navigation ("next", "prev" or "goto" with a filename)."""
+    global nav_request
+    with state_cond:
+        nav_request = (action, target)
+        _state_changed()
+    print(f"Navigation requested: {action}" + (f" {target}" if target else ""))
+
+
+def take_nav():
+    """Return and clear the pending navigation request, or None."""
+    global nav_request
+    with state_cond:
+        nav, nav_request = nav_request, None
+        return nav
+
+
+def peek_nav():
+    """Check if navigation is requested without consuming it."""
+    return nav_request is not None
 
 
 def handle_off():
     global isRunning
-    with lock:
+    with state_cond:
         isRunning = False
+        _state_changed()
     print("Turning off display")
 
 
 def handle_on():
     global isRunning
-    with lock:
+    with state_cond:
         isRunning = True
+        _state_changed()
     print("Turning on display")
 
 
 def getIsRunning():
-    with lock:
-        return isRunning
+    return isRunning
+
+
+def set_now_showing(paths, idx):
+    """Publish the on-screen playlist position for the status query."""
+    global now_showing
+    now_showing = (os.path.basename(paths[idx]) if paths else None, idx, len(paths))
 
 
 # =============================================================================
-# Control socket
+# Metrics — rolling timings, queried with the "stats" control command
 # =============================================================================
 
-try:
-    os.unlink(CTRL_SOCK)
-except FileNotFoundError:
-    pass
-except OSError as e:
-    print(f"Warning: could not remove old socket {CTRL_SOCK}: {e}")
+decode_ms = Histogram()
+blit_ms = Histogram()
+lateness_ms = Histogram()
+transition_ms = Histogram()
+live_latency_ms = Histogram()
+blit_rate = RateMeter()
+started_at = time.monotonic()
+
+# Single render clock shared by fades and GIF playback
+clock = FrameClock(lateness_hist=lateness_ms)
+
+# Startup milestones, including time to first pixel
+startup = StartupTimer()
+
+
+def collect_stats():
+    """Return a JSON-serialisable snapshot of viewer timing metrics."""
+    return {
+        "uptime_s": round(time.monotonic() - started_at, 1),
+        "fps": blit_rate.rate(),
+        "decode_ms": decode_ms.summary(),
+        "blit_ms": blit_ms.summary(),
+        "lateness_ms": lateness_ms.summary(),
+        "transition_ms": transition_ms.summary(),
+        "clock": clock.stats(),
+        "decoder": decoder.stats() if decoder else None,
+        "decoded_cache": decoded_cache.stats(),
+        "startup": startup.summary(),
+        "live": dict(live_input.stats(), latency_ms=live_latency_ms.summary()) if live_input else None,
+    }
+
+
+def collect_status():
+    """Return what the viewer is showing and its current settings."""
+    name, index, count = now_showing
+    transition, duration_ms = get_transition()
+    return {
+        "image": name,
+        "position": {"index": index, "count": count},
+        "power": "on" if isRunning else "off",
+        "live": bool(live_input and live_input.active(live_timeout_s)),
+        "brightness": current_brightness,
+        "hold_seconds": get_hold_seconds(),
+        "transition": transition,
+        "transition_ms": duration_ms,
+        "warmup": warmup.progress() if warmup else None,
+        "playlist": playlist_name,
+        "bundle": active_bundle is not None,
+    }
 
-sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-sock.bind(CTRL_SOCK)
 
+# =============================================================================
+# Control socket
+# =============================================================================
+
+sock = None
 last_brightness_update = 0
 BRIGHTNESS_RATE_LIMIT_S = 0.2
 
 
 def handle_set_brightness(value):
     """Set brightness with scaling (100% UI = MAX_BRIGHTNESS% hardware)."""
+    global current_brightness
     if 1 <= value <= 100:
         hw_brightness = scale_brightness(value)
         matrix.brightness = hw_brightness
+        current_brightness = value
         print(f"Set brightness to {value}% (hardware: {hw_brightness}%)")
     else:
         print(f"Invalid brightness value: {value} (must be 1-100)")
 
 
+def set_brightness_value(value):
+    handle_set_brightness(value)
+    # Wake the render loop so a held frame is redrawn at the new brightness
+    notify_state_change()
+
+
 def try_update_brightness(value):
+    """Rate-limited brightness for fire-and-forget datagrams (e.g. a dragged slider)."""
     global last_brightness_update
     now = time.monotonic()
     if now - last_brightness_update >= BRIGHTNESS_RATE_LIMIT_S:
-        handle_set_brightness(value)
+        set_brightness_value(value)
         last_brightness_update = now
 
 
+def _int_arg(lo, hi):
+    def parse(value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"expected an integer, got {value!r}")
+        if not lo <= value <= hi:
+            raise ValueError(f"{value} out of range ({lo}-{hi})")
+        return value
+    return parse
+
+
+def _name_arg(value):
+    if not isinstance(value, str) or not value:
+        raise ValueError("expected an image name")
+    return value
+
+
+def _playlist_arg(value):
+    if not isinstance(value, str) or not value or os.sep in value or value.startswith("."):
+        raise ValueError("expected a playlist name")
+    if value != CURRENT_PLAYLIST and not os.path.isfile(bundle_path(value)):
+        raise ValueError(f"unknown playlist {value!r}")
+    return value
+
+
+def _transition_arg(value):
+    kind = str(value or "").strip().lower()
+    if kind not in transitions.TRANSITIONS:
+        raise ValueError(f"unknown transition {kind!r} (must be one of {', '.join(transitions.TRANSITIONS)})")
+    return kind
+
+
+def _status_field(value):
+    if value not in collect_status():
+        raise ValueError(f"unknown status field {value!r}")
+    return value
+
+
+# name -> (argument parser or None, handler). Commands change state; queries
+# return their handler's result to the client.
+COMMANDS = {
+    "on": (None, handle_on),
+    "off": (None, handle_off),
+    "reload": (None, request_reload),
+    "next": (None, lambda: request_nav("next")),
+    "prev": (None, lambda: request_nav("prev")),
+    "goto": (_name_arg, lambda name: request_nav("goto", name)),
+    "brightness": (_int_arg(1, 100), set_brightness_value),
+    "hold": (_int_arg(1, 3600), set_hold_seconds_value),
+    "transition": (_transition_arg, lambda kind: set_transition_value(kind=kind)),
+    "transition_ms": (_int_arg(100, 10000), lambda ms: set_transition_value(duration_ms=ms)),
+    "playlist": (_playlist_arg, set_playlist),
+}
+QUERIES = {
+    "status": (None, collect_status),
+    "stats": (None, collect_stats),
+    "get": (_status_field, lambda field: collect_status()[field]),
+}
+
+
+def run_commands(cmds, atomic=False):
+    """
+    Validate and apply a batch of command entries in order, returning one
+    result dict per entry. An atomic batch is applied under state_cond as a
+    single state change, and not at all if any entry is invalid.
+    """
+    results, plan = [], []
+    for entry in cmds:
+        name = entry.get("cmd")
+        result = {"cmd": name, "ok": True}
+        spec = COMMANDS.get(name) or QUERIES.get(name)
+        try:
+            if spec is None:
+                raise ValueError("unknown command")
+            parse, handler = spec
+            args = (parse(entry.get("value")),) if parse else ()
+            plan.append((result, handler, args, name in QUERIES))
+        except ValueError as e:
+            result.update(ok=False, error=f"{name}: {e}")
+            print(f"Rejected command {name!r}: {e}")
+        results.append(result)
+
+    if atomic and not all(r["ok"] for r in results):
+        for r in results:
+            if r["ok"]:
+                r.update(ok=False, error="not applied: batch rejected")
+        return results
+
+    with state_cond:
+        for result, handler, args, is_query in plan:
+            try:
+                value = handler(*args)
+                if is_query:
+                    result["value"] = value
+            except Exception as e:
+                result.update(ok=False, error=str(e))
+                print(f"Command {result['cmd']!r} failed: {e}")
+    return results
+
+
+def handle_datagram(data, addr):
+    """Handle one control datagram; protocol requests are answered at addr."""
+    try:
+        request_id, cmds, atomic, legacy = ctl_protocol.decode_request(data)
+    except (ctl_protocol.ProtocolError, UnicodeDecodeError) as e:
+        print(f"Bad control request: {e}")
+        if addr:
+            sock.sendto(ctl_protocol.encode_response(getattr(e, "request_id", None), [], error=str(e)), addr)
+        return
+
+    if legacy:
+        entry = cmds[0]
+        if entry["cmd"] == "brightness":
+            try:
+                try_update_brightness(_int_arg(1, 100)(entry.get("value")))
+            except ValueError as e:
+                print(f"Invalid brightness: {e}")
+            return
+        results = run_commands(cmds)
+        # Old-style "stats" callers expect the bare JSON document
+        if entry["cmd"] in QUERIES and addr and results[0]["ok"]:
+            sock.sendto(json.dumps(results[0]["value"]).encode("utf-8"), addr)
+        return
+
+    results = run_commands(cmds, atomic)
+    # Only clients with a bound address can receive a reply
+    if addr:
+        sock.sendto(ctl_protocol.encode_response(request_id, results), addr)
+
+
+def open_control_socket():
+    """Bind the control socket, replacing any stale one from a previous run."""
+    global sock
+    try:
+        os.unlink(CTRL_SOCK)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Warning: could not remove old socket {CTRL_SOCK}: {e}")
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(CTRL_SOCK)
+    return sock
+
+
 def control_thread():
     """Listen for commands on the Unix socket. Restarts on errors."""
     while True:
         try:
-            msg, _ = sock.recvfrom(256)
-            msg = msg.decode("utf-8").strip()
-            if msg == "off":
-                handle_off()
-            elif msg == "on":
-                handle_on()
-            elif msg == "reload":
-                request_reload()
-            elif msg.startswith("brightness:"):
-                try:
-                    value = int(msg.split(":")[1])
-                    if 1 <= value <= 100:
-                        try_update_brightness(value)
-                    else:
-                        print(f"Invalid brightness value: {value} (must be 1-100)")
-                except ValueError:
-                    print(f"Invalid brightness format: {msg}")
-            elif msg.startswith("hold:"):
-                try:
-                    value = int(msg.split(":")[1])
-                    if 1 <= value <= 3600:
-                        set_hold_seconds_value(value)
-                    else:
-                        print(f"Invalid hold_seconds value: {value} (must be 1-3600)")
-                except ValueError:
-                    print(f"Invalid hold format: {msg}")
-            else:
-                print(f"Unknown command: {msg}")
+            data, addr = sock.recvfrom(ctl_protocol.MAX_DATAGRAM)
+            handle_datagram(data, addr)
         except Exception as e:
             print(f"Error in control thread: {e}")
             time.sleep(0.5)
 
 
-threading.Thread(target=control_thread, daemon=True).start()
-
-
 # =============================================================================
 # Image loading — lazy: only decode images when needed for display
 # =============================================================================
 
-def load_order():
-    """Load image order from order.json if it exists."""
-    if os.path.isfile(ORDER_FILE):
-        try:
-            with open(ORDER_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading order.json: {e}")
-    return None
+# Index of the image folder shared with the server (see catalog.py); opened
+# in main()
+image_catalog = None
+
+
+def file_signature(path):
+    """(mtime_ns, size) of path, or None if it can't be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
 
-def get_sorted_image_paths(folder):
-    """Return sorted list of image file paths without loading pixel data."""
-    if not os.path.isdir(folder):
-        return []
+def playlist_signatures(paths):
+    return {p: file_signature(p) for p in paths}
 
-    files = [f for f in os.listdir(folder)
-             if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"))]
 
-    if not files:
-        return []
+# The mapped bundle of the playlist being played, or None when playing from
+# the image folder. Replaced as a whole on reload, so readers just take a
+# reference; frames already handed out keep their old mapping alive.
+active_bundle = None
 
-    order = load_order()
-    if order:
-        order_map = {name: idx for idx, name in enumerate(order)}
-        def sort_key(f):
-            if f in order_map:
-                return (0, order_map[f], f)
-            return (1, 0, f)
-        files = sorted(files, key=sort_key)
-    else:
-        files = sorted(files)
 
-    return [os.path.join(folder, f) for f in files]
+def open_bundle(name, target_size):
+    """Map the named playlist bundle, or return None if it is missing, stale or for another panel size."""
+    path = bundle_path(name)
+    try:
+        b = bundle.Bundle(path, IMAGE_FOLDER)
+    except FileNotFoundError:
+        if name != CURRENT_PLAYLIST:
+            print(f"Playlist bundle {path} not found, playing the image folder")
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring playlist bundle {path}: {e}")
+        return None
+    if b.size != tuple(target_size):
+        print(f"Ignoring playlist bundle {path}: compiled for {b.size[0]}x{b.size[1]}")
+        return None
+    if not b.is_current(IMAGE_FOLDER, ORDER_FILE):
+        print(f"Playlist bundle {path} is out of date, playing the image folder")
+        return None
+    return b
+
+
+def read_playlist(target_size):
+    """
+    Return (paths, signatures) of the playlist to play: from its compiled
+    bundle when there is a usable one, otherwise from the image catalog;
+    either way the only file system access is a stat per entry.
+    """
+    global active_bundle
+    active_bundle = open_bundle(playlist_name, target_size)
+    if active_bundle is not None:
+        return list(active_bundle.paths), active_bundle.signatures()
+    # The listing comes from the catalog, but files are stat'ed here so that
+    # edits made outside the server are still noticed
+    paths = image_catalog.paths()
+    return paths, playlist_signatures(paths)
+
+
+PlaylistDiff = namedtuple("PlaylistDiff", "added removed modified reordered")
+
+
+def diff_playlist(old_paths, old_sigs, new_paths, new_sigs):
+    """Compare two playlists by path and file signature."""
+    old_set, new_set = set(old_paths), set(new_paths)
+    added = [p for p in new_paths if p not in old_set]
+    removed = [p for p in old_paths if p not in new_set]
+    modified = [p for p in new_paths if p in old_set and old_sigs.get(p) != new_sigs.get(p)]
+    kept_old = [p for p in old_paths if p in new_set]
+    kept_new = [p for p in new_paths if p in old_set]
+    return PlaylistDiff(added, removed, modified, kept_old != kept_new)
+
+
+def reload_position(old_paths, idx, new_paths):
+    """
+    Index in new_paths to show after a reload: the current image if it is
+    still there, else the first surviving image that followed it.
+    """
+    new_index = {p: i for i, p in enumerate(new_paths)}
+    n = len(old_paths)
+    for k in range(n):
+        p = old_paths[(idx + k) % n]
+        if p in new_index:
+            return new_index[p]
+    return 0
+
+
+# Animations up to this size are kept fully decoded; set from config.ini in main()
+gif_cache_budget = GIF_CACHE_BUDGET_BYTES
+
+decoder = None
+
+
+def start_decoder():
+    """Start the decoder process; without it images are decoded on viewer threads."""
+    global decoder
+    if DECODER_CPU_CORES is None:
+        return
+    try:
+        decoder = decoder_process.Decoder(DECODER_CPU_CORES, gif_cache_budget).start()
+        print(f"Decoder process started on cores: {DECODER_CPU_CORES}")
+    except OSError as e:
+        print(f"Decoder process unavailable, decoding in-process: {e}")
+        decoder = None
+
+
+class DecodedCache:
+    """
+    Byte-budgeted LRU of load_single_image() results, so a playlist that fits
+    in the budget is decoded once rather than on every cycle. Animations
+    are charged for all their frames; streamed GIFs are never kept.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (path, target_size) -> (result, nbytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _nbytes(result):
+        pixels, durations = result
+        if durations is None:
+            return pixels.nbytes
+        if isinstance(pixels, frame_cache.Animation):
+            return pixels.nbytes
+        return None
+
+    def get(self, path, target_size):
+        with self._lock:
+            entry = self._entries.get((path, target_size))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((path, target_size))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, path, target_size, result):
+        if result is None:
+            return
+        nbytes = self._nbytes(result)
+        if nbytes is None or nbytes > self.budget:
+            return
+        with self._lock:
+            old = self._entries.pop((path, target_size), None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[(path, target_size)] = (result, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.budget:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self, paths):
+        """Forget paths that were removed or changed on disk."""
+        paths = set(paths)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in paths]:
+                self.bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "budget": self.budget,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+decoded_cache = DecodedCache(0)
+
+
+warmup = None
+
+
+def start_warmup(paths, idx):
+    """Fill the frame cache for paths in the background, starting at paths[idx]."""
+    if warmup is not None and paths:
+        b = active_bundle
+        warmup.start([p for p in paths[idx:] + paths[:idx] if b is None or p not in b])
 
 
 def load_single_image(path, target_size):
     """
-    Load and decode a single image on demand.
+    Load a single image on demand, from the playlist bundle, memory or the
+    frame cache when possible.
     Returns (numpy_array_or_frames, durations_or_none) or None on error.
     """
-    try:
-        img = Image.open(path)
-        is_animated_gif = getattr(img, "is_animated", False) and path.lower().endswith('.gif')
+    b = active_bundle
+    if b is not None and path in b:
+        return b.load(path)
+    result = decoded_cache.get(path, target_size)
+    if result is not None:
+        return result
+    result = _load_uncached(path, target_size)
+    decoded_cache.put(path, target_size, result)
+    return result
 
-        if is_animated_gif:
-            frames = []
-            durations = []
-            try:
-                while True:
-                    duration = img.info.get('duration', 100)
-                    durations.append(duration)
-                    frame = img.convert("RGB")
-                    frame.thumbnail(target_size, Image.LANCZOS)
-                    canvas = Image.new("RGB", target_size, (0, 0, 0))
-                    x = (target_size[0] - frame.width) // 2
-                    y = (target_size[1] - frame.height) // 2
-                    canvas.paste(frame, (x, y))
-                    frames.append(np.asarray(canvas, dtype=np.uint8))
-                    img.seek(img.tell() + 1)
-            except EOFError:
-                pass
-            finally:
-                img.close()
-            if frames:
-                return frames, durations
-            return None
-        else:
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-            img.thumbnail(target_size, Image.LANCZOS)
-            canvas = Image.new("RGB", target_size, (0, 0, 0))
-            x = (target_size[0] - img.width) // 2
-            y = (target_size[1] - img.height) // 2
-            canvas.paste(img, (x, y))
-            arr = np.asarray(canvas, dtype=np.uint8)
-            img.close()
-            return arr, None
+
+def _load_uncached(path, target_size):
+    try:
+        with decode_ms.time():
+            # Animated GIFs always stream so playback starts at the first
+            # frame; the decoder process only replies once the whole
+            # animation is decoded, so it gets stills only
+            if decoder is not None and not frame_cache.is_animated_gif(path):
+                cached = frame_cache.load(path, target_size)
+                if cached is not None:
+                    return cached
+                return decoder.decode(path, target_size)
+            return frame_cache.open_for_playback(
+                path, target_size, GIF_STREAM_RING_FRAMES, gif_cache_budget)
     except Exception as e:
         print(f"Skipping {path}: {e}")
         return None
 
 
+class Prefetcher:
+    """
+    Decode playlist entries around the current position on a background thread,
+    so advancing or navigating never waits on a decode.
+    """
+
+    def __init__(self, target_size, ahead=PREFETCH_AHEAD, behind=PREFETCH_BEHIND):
+        self.target_size = target_size
+        self.ahead = ahead
+        self.behind = behind
+        self._cond = threading.Condition()
+        self._wanted = []   # paths to keep decoded, in priority order
+        self._ready = {}    # path -> load_single_image() result (None = broken)
+        self._busy = None   # path the worker is decoding right now
+        self._gen = 0       # bumped by invalidate() so in-flight decodes are discarded
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def set_position(self, paths, idx):
+        """Re-center the look-ahead window on paths[idx]."""
+        wanted = []
+        n = len(paths)
+        if n:
+            offsets = [0]
+            for k in range(1, max(self.ahead, self.behind) + 1):
+                if k <= self.ahead:
+                    offsets.append(k)
+                if k <= self.behind:
+                    offsets.append(-k)
+            for off in offsets:
+                p = paths[(idx + off) % n]
+                if p not in wanted:
+                    wanted.append(p)
+        with self._cond:
+            self._wanted = wanted
+            for p in list(self._ready):
+                if p not in wanted:
+                    release(self._ready.pop(p))
+            self._cond.notify_all()
+
+    def clear(self):
+        """Drop all decoded data (e.g. after the image folder changed)."""
+        with self._cond:
+            self._wanted = []
+            for result in self._ready.values():
+                release(result)
+            self._ready.clear()
+
+    def invalidate(self, paths):
+        """Drop decoded data for paths that were removed or changed on disk."""
+        decoded_cache.invalidate(paths)
+        with self._cond:
+            self._gen += 1
+            for p in paths:
+                if p in self._ready:
+                    release(self._ready.pop(p))
+            self._cond.notify_all()
+
+    def get(self, path):
+        """Return decoded data for path, decoding synchronously if not prefetched."""
+        with self._cond:
+            while self._busy == path:
+                self._cond.wait()
+            if path in self._ready:
+                return self._ready[path]
+            gen = self._gen
+        while True:
+            result = load_single_image(path, self.target_size)
+            with self._cond:
+                if path in self._ready:
+                    release(result)
+                    return self._ready[path]
+                if gen == self._gen:
+                    # Kept even outside the window: the set_position() that
+                    # moves away from path releases it (stopping a GIF stream)
+                    self._ready[path] = result
+                    return result
+                # Invalidated while decoding: the result may be stale
+                release(result)
+                gen = self._gen
+
+    def _run(self):
+        while True:
+            with self._cond:
+                path = None
+                while path is None:
+                    path = next((p for p in self._wanted if p not in self._ready), None)
+                    if path is None:
+                        self._cond.wait()
+                self._busy = path
+                gen = self._gen
+            result = None
+            try:
+                result = load_single_image(path, self.target_size)
+            finally:
+                with self._cond:
+                    self._busy = None
+                    if path in self._wanted and gen == self._gen:
+                        self._ready[path] = result
+                    else:
+                        release(result)
+                    self._cond.notify_all()
+
+
+def first_frame(pixels, durations):
+    """Return the frame used for fades: the still itself, or an animation's first frame."""
+    return pixels.first_frame if durations is not None else pixels
+
+
+def release(result):
+    """Stop any background decoding owned by a load_single_image() result."""
+    if result is not None and result[1] is not None:
+        result[0].close()
+
+
+def next_transition_image(path):
+    """Decode (or fetch prefetched) path and return its fade frame, or None if broken."""
+    result = prefetcher.get(path)
+    return first_frame(*result) if result is not None else None
+
+
+def resolve_nav(nav, idx, paths):
+    """Return the playlist index to show after the current one, or None to stay."""
+    if nav is None or nav[0] == "next":
+        return (idx + 1) % len(paths)
+    if nav[0] == "prev":
+        return (idx - 1) % len(paths)
+    for i, p in enumerate(paths):
+        if os.path.basename(p) == nav[1]:
+            return i
+    print(f"goto: image not found: {nav[1]}")
+    return None
+
+
 # =============================================================================
 # Rendering helpers
 # =============================================================================
 
-def make_gamma_tables(gamma=GAMMA):
-    x = np.arange(256, dtype=np.float32) / 255.0
-    to_gamma = np.clip((x ** gamma) * 255.0 + 0.5, 0, 255).astype(np.uint8)
-    to_linear = np.clip((x ** (1.0 / gamma)) * 255.0 + 0.5, 0, 255).astype(np.uint8)
-    return to_gamma, to_linear
+# Reused across blits: one PIL image per frame size, plus a copy of the last
+# frame sent so unchanged frames (e.g. re-blits during a hold) are skipped.
+_blit_image = None
+_last_frame = None
+_last_brightness = None
 
+# Every frame that reaches the panel is also published here for the web
+# preview (see preview.py); None if the ring could not be created
+preview_writer = None
 
-_TO_GAMMA, _TO_LINEAR = make_gamma_tables(GAMMA)
 
+def open_preview(width, height):
+    global preview_writer
+    try:
+        preview_writer = live.RingWriter(PREVIEW_RING, width, height, slots=2)
+    except OSError as e:
+        print(f"Preview disabled: {e}")
 
-def scale_perceptual(img_u8, scale01):
-    lin = _TO_LINEAR[img_u8]
-    s = int(scale01 * 256 + 0.5)
-    out = (lin.astype(np.uint16) * s) >> 8
-    return _TO_GAMMA[out.astype(np.uint8)]
 
+def clear_panel(matrix):
+    """Blank the panel (and the preview) outside of the frame pipeline."""
+    matrix.Clear()
+    invalidate_blit()
+    if preview_writer is not None:
+        preview_writer.write(np.zeros((matrix.height, matrix.width, 3), dtype=np.uint8))
 
-def blit(matrix, off, frame_u8):
-    """Blit a numpy frame to the matrix."""
-    if isinstance(frame_u8, np.ndarray):
-        pil_img = Image.fromarray(frame_u8, mode="RGB")
-    elif isinstance(frame_u8, Image.Image):
-        pil_img = frame_u8
-        if pil_img.mode != "RGB":
-            pil_img = pil_img.convert("RGB")
-    else:
-        pil_img = Image.fromarray(np.array(frame_u8, dtype=np.uint8), mode="RGB")
 
-    matrix.SetImage(pil_img)
-    return off
+def invalidate_blit():
+    """Forget the last blitted frame, e.g. after matrix.Clear()."""
+    global _last_frame
+    _last_frame = None
 
 
-def smoothstep(t):
-    return t * t * (3.0 - 2.0 * t)
+def blit(matrix, off, frame_u8):
+    """
+    Draw a frame into the offscreen canvas and swap it in on the next VSync.
+    Returns the new offscreen canvas (the previously displayed one), or off
+    unchanged if the frame is identical to what is already on the panel.
+    """
+    global _blit_image, _last_frame, _last_brightness
+    if isinstance(frame_u8, Image.Image):
+        frame_u8 = np.asarray(frame_u8 if frame_u8.mode == "RGB" else frame_u8.convert("RGB"))
+    frame = np.ascontiguousarray(frame_u8, dtype=np.uint8)
+
+    brightness = matrix.brightness
+    if (_last_frame is not None and _last_frame.shape == frame.shape
+            and brightness == _last_brightness and np.array_equal(_last_frame, frame)):
+        return off
+
+    h, w = frame.shape[:2]
+    if _blit_image is None or _blit_image.size != (w, h):
+        _blit_image = Image.new("RGB", (w, h))
+        _last_frame = None
+    # Copies the buffer straight into the existing image — no new PIL object
+    _blit_image.frombytes(frame)
+
+    # Brightness is per canvas; keep the back buffer in sync with the matrix
+    with blit_ms.time():
+        off.brightness = brightness
+        off.SetImage(_blit_image)
+        off = matrix.SwapOnVSync(off)
+    blit_rate.tick()
+    startup.first_pixel()
+    if preview_writer is not None:
+        preview_writer.write(frame)
+
+    if _last_frame is None:
+        _last_frame = np.empty_like(frame)
+    np.copyto(_last_frame, frame)
+    _last_brightness = brightness
+    return off
 
 
 def fade_to_level(matrix, off, img, start_level, end_level, steps=FADE_STEPS, fps=FADE_FPS):
     frame_time = 1.0 / float(fps)
-    start = time.perf_counter()
-    for i in range(steps + 1):
+    img = np.asarray(img, dtype=np.uint8)
+    frame = fade_buffer(img.shape)
+    start = clock.now()
+    i = 0
+    while True:
         t = i / float(steps)
         s = smoothstep(t)
         level = start_level + (end_level - start_level) * s
-        frame = scale_perceptual(img, level)
+        scale_perceptual_into(img, level, frame)
         off = blit(matrix, off, frame)
-        next_time = start + (i + 1) * frame_time
-        remain = next_time - time.perf_counter()
-        if remain > 0:
-            time.sleep(remain)
-    return off
+        if i >= steps:
+            return off
+        clock.wait(start + (i + 1) * frame_time)
+        # Skip levels whose slot already passed; the final level is always drawn
+        i = min(steps, clock.due_index(start, frame_time, i + 1))
 
 
 def fade_out_to_black(matrix, off, img):
@@ -385,220 +1076,575 @@ def fade_in_from_black(matrix, off, img):
     return fade_to_level(matrix, off, img, start_level=0.0, end_level=1.0)
 
 
+def transition_params():
+    """Return (kind, steps, black_frames) for the current transition settings."""
+    kind, duration_ms = get_transition()
+    steps = max(1, int(round(duration_ms / 1000.0 * FADE_FPS)))
+    black_frames = int(round(BLACK_PAUSE_S * FADE_FPS)) if kind == "fade" else 0
+    return kind, steps, black_frames
+
+
+def prepare_transition(from_path, to_path, img, load_next):
+    """Start rendering the from_path -> to_path transition in the background."""
+    kind, steps, black_frames = transition_params()
+    planner.prepare((from_path, to_path, kind, steps), kind, img, load_next, steps, black_frames)
+
+
+def transition_to(matrix, off, from_path, to_path, img, next_img):
+    """Play the transition between two images, using precomputed frames if prepared."""
+    kind, steps, black_frames = transition_params()
+    frames = planner.take((from_path, to_path, kind, steps), kind, img, next_img, steps, black_frames)
+    frame_time = 1.0 / float(FADE_FPS)
+    last = len(frames) - 1
+    start = clock.now()
+    i = 0
+    while True:
+        off = blit(matrix, off, frames[i])
+        if i >= last:
+            return off
+        clock.wait(start + (i + 1) * frame_time)
+        i = min(last, clock.due_index(start, frame_time, i + 1))
+
+
 def show_still(matrix, off, img, seconds):
-    """Display a static image for the specified duration."""
-    start = time.time()
-    end = start + seconds
+    """
+    Display a static image for the specified duration.
+    Returns (off, interrupted) — interrupted is True on reload or navigation.
+    """
+    end = time.monotonic() + seconds
+    seen = state_version
 
-    while time.time() < end:
+    while True:
         if not getIsRunning():
-            break
-        if peek_reload():
+            return off, False
+        if peek_reload() or peek_nav() or live_pending():
             return off, True
+        # No-op unless the frame or brightness changed since the last blit
         off = blit(matrix, off, img)
-        time.sleep(0.1)
-
-    return off, False
+        seen = wait_for_state_change(seen, end)
+        if seen is None:
+            return off, False
 
 
-def show_gif(matrix, off, frames, durations, total_seconds):
-    """Play an animated GIF in a loop until total_seconds have elapsed."""
-    start = time.time()
-    end = start + total_seconds
-    frame_idx = 0
-    num_frames = len(frames)
+def show_gif(matrix, off, frames, total_seconds):
+    """
+    Play an animated GIF (a frame_cache Animation or GifStream) until
+    total_seconds have elapsed.
+    """
+    now = clock.now()
+    end = now + total_seconds
+    next_frame = now
+    player = frames.play()
+    seen = state_version
 
-    while time.time() < end:
+    while True:
         if not getIsRunning():
-            break
-        if peek_reload():
+            return off, False
+        if peek_reload() or peek_nav() or live_pending():
             return off, True
 
-        off = blit(matrix, off, frames[frame_idx])
+        now = clock.now()
+        if now >= end:
+            return off, False
+
+        if now >= next_frame:
+            lateness = clock.record(next_frame)
+            if lateness >= RESYNC_THRESHOLD_S:
+                clock.resync()
+                next_frame = now
+            else:
+                # Drop frames whose whole slot has already passed, without
+                # rendering or waiting for them to be decoded
+                dropped, dropped_s = player.skip(now - next_frame, GIF_MIN_FRAME_MS)
+                if dropped:
+                    clock.drop(dropped)
+                    next_frame += dropped_s
+            frame, duration = next(player)
+            slot = max(duration, GIF_MIN_FRAME_MS) / 1000.0
+            off = blit(matrix, off, frame)
+            # Deadlines advance from the previous deadline, not from now, so
+            # GIFs play at their authored rate without cumulative drift
+            next_frame += slot
+
+        woke = wait_for_state_change(seen, min(next_frame, end))
+        if woke is not None:
+            seen = woke
+
+
+# =============================================================================
+# Live input — frames pushed by other processes (see live.py)
+# =============================================================================
+
+live_input = None
+live_timeout_s = LIVE_TIMEOUT_S
 
-        frame_duration = durations[frame_idx] / 1000.0
-        frame_start = time.time()
-        while time.time() - frame_start < frame_duration:
-            if not getIsRunning():
-                return off, False
-            if peek_reload():
-                return off, True
-            time.sleep(min(0.05, frame_duration / 2))
 
-        frame_idx = (frame_idx + 1) % num_frames
+def live_pending():
+    """True if a live frame is waiting to be shown."""
+    return live_input is not None and live_input.has_pending()
 
-    return off, False
+
+def start_live_input(width, height):
+    global live_input, live_timeout_s
+    settings = load_live_config()
+    if not settings["enabled"]:
+        return
+    live_timeout_s = settings["timeout_s"]
+    try:
+        live_input = live.LiveInput(
+            width, height, ring_path=LIVE_RING, unix_path=LIVE_SOCK, udp_addrs=settings["udp"],
+            e131_universe=settings["e131_universe"], on_frame=notify_state_change,
+        ).start()
+    except OSError as e:
+        print(f"Live input disabled: {e}")
+        live_input = None
+
+
+def show_live(matrix, off):
+    """
+    Show live frames as they arrive until none has come for live_timeout_s.
+    Returns (off, last_frame).
+    """
+    print("Live input: showing live frames")
+    seen = state_version
+    last = None
+    while True:
+        if not getIsRunning() or peek_reload():
+            return off, last
+        item = live_input.take()
+        if item is not None:
+            last, timestamp_ns = item
+            off = blit(matrix, off, last)
+            live_latency_ms.add((time.monotonic_ns() - timestamp_ns) / 1e6)
+        elif not live_input.active(live_timeout_s):
+            print("Live input: timed out, back to playlist")
+            return off, last
+        woke = wait_for_state_change(seen, live_input.last_rx + live_timeout_s)
+        if woke is not None:
+            seen = woke
 
 
 # =============================================================================
-# Matrix setup
+# Resume state — playlist position and last frame, restored on the next start
 # =============================================================================
 
-print("Starting viewer...")
+# The resume state lives on the SD card, so it is written at most this
+# often (the newest position wins) and once more on shutdown
+PERSIST_INTERVAL_S = 300
 
-BRIGHTNESS, HOLD_SECONDS = load_config()
-current_hold_seconds = HOLD_SECONDS
+_persist_cond = threading.Condition()
+_persist_pending = None
+_persist_lock = threading.Lock()
+_persist_saved = {"state": None, "frame": None}
+
+
+def load_resume_state():
+    try:
+        with open(VIEWER_STATE_FILE) as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def load_last_frame(width, height):
+    """The frame saved by the previous run, or None if missing or for another panel size."""
+    try:
+        frame = np.load(LAST_FRAME_FILE)
+    except (OSError, ValueError):
+        return None
+    if frame.shape != (height, width, 3) or frame.dtype != np.uint8:
+        return None
+    return frame
 
-options = RGBMatrixOptions()
-options.rows = 64
-options.cols = 64
-options.chain_length = 1
-options.parallel = 1
-options.hardware_mapping = 'regular'
-options.brightness = scale_brightness(BRIGHTNESS)
-options.pwm_bits = 8
-options.pwm_lsb_nanoseconds = 130
-options.gpio_slowdown = 2
 
-matrix = RGBMatrix(options=options)
-offscreen = matrix.CreateFrameCanvas()
+def resume_index(paths, state):
+    """Index of the image the previous run was showing, by name, else by position."""
+    name = state.get("image")
+    for i, p in enumerate(paths):
+        if os.path.basename(p) == name:
+            return i
+    index = state.get("index")
+    return index if isinstance(index, int) and 0 <= index < len(paths) else 0
+
+
+def persist_position(paths, idx, img):
+    """Queue the playlist position and its frame to be saved for the next start."""
+    global _persist_pending
+    if not paths:
+        return
+    state = {"playlist": playlist_name, "image": os.path.basename(paths[idx]), "index": idx}
+    with _persist_cond:
+        _persist_pending = (state, img)
+        _persist_cond.notify()
+
+
+def _atomic_write(dest, write):
+    tmp = dest + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, dest)
+
+
+def _write_resume(state, frame):
+    """Save state and frame, skipping whichever is unchanged since the last save."""
+    saved = _persist_saved
+    with _persist_lock:
+        try:
+            if state != saved["state"]:
+                _atomic_write(VIEWER_STATE_FILE, lambda f: f.write(json.dumps(state).encode("utf-8")))
+                saved["state"] = state
+            if frame is not None and (saved["frame"] is None or not np.array_equal(frame, saved["frame"])):
+                saved["frame"] = np.array(frame, dtype=np.uint8)
+                _atomic_write(LAST_FRAME_FILE, lambda f: np.save(f, saved["frame"]))
+        except OSError as e:
+            print(f"Could not save resume state: {e}")
+
+
+def _take_persist_pending():
+    global _persist_pending
+    item, _persist_pending = _persist_pending, None
+    return item
+
+
+def persist_thread():
+    """Write queued resume state off the render thread, at most every PERSIST_INTERVAL_S."""
+    last_write = None
+    while True:
+        with _persist_cond:
+            while _persist_pending is None:
+                _persist_cond.wait()
+            if last_write is not None:
+                # Later positions replace the pending one while we wait
+                due = last_write + PERSIST_INTERVAL_S
+                while _persist_pending is not None and time.monotonic() < due:
+                    _persist_cond.wait(due - time.monotonic())
+            item = _take_persist_pending()
+        if item is None:
+            continue  # written by flush_resume_state()
+        _write_resume(*item)
+        last_write = time.monotonic()
+
+
+def flush_resume_state():
+    """Save any queued resume state now (on shutdown)."""
+    with _persist_cond:
+        item = _take_persist_pending()
+    if item is not None:
+        _write_resume(*item)
+
 
 # =============================================================================
-# Main display loop — lazy image loading
+# Entry point
 # =============================================================================
 
-# current_paths: ordered list of image file paths
-# current_data: decoded pixel data for the currently-displayed image (loaded on demand)
-# current_img: the first frame (numpy array) of current_data, used for fade transitions
-current_paths = get_sorted_image_paths(IMAGE_FOLDER)
-current_data_pixels = None
-current_durations = None
-current_img = None
-idx = 0
-
-# Try to load the first valid image (may be empty on first boot)
-for i, p in enumerate(current_paths):
-    result = load_single_image(p, (matrix.width, matrix.height))
-    if result is not None:
-        current_data_pixels, current_durations = result
-        current_img = current_data_pixels[0] if current_durations is not None else current_data_pixels
-        idx = i
-        break
+matrix = None
+prefetcher = None
+planner = None
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def create_matrix(brightness):
+    """Create the output matrix (hardware or simulator, see matrix_backend)."""
+    g = MATRIX_GEOMETRY
+    hardware_options = {k: v for k, v in g.items()
+                        if k not in ("rows", "cols", "chain_length", "parallel")}
+    return matrix_backend.create_matrix(
+        g["rows"], g["cols"], g["chain_length"], g["parallel"],
+        scale_brightness(brightness), hardware_options,
+    )
+
+
+def main():
+    global matrix, prefetcher, planner, current_brightness, decoded_cache, warmup, playlist_name
+    global image_catalog, gif_cache_budget
+
+    # Startup is ordered for time to first pixel: the matrix comes up and
+    # shows the last frame of the previous run before anything slow (decoder
+    # process, sockets, playlist scan, first decode) is started.
+
+    print("Starting viewer...")
+    set_cpu_affinity()
+    # systemd stops the viewer with SIGTERM; shut down like on CTRL-C so the
+    # resume state is flushed and the panel cleared
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+
+    brightness, hold_seconds, transition, transition_duration_ms = load_config()
+    current_brightness = brightness
+    set_hold_seconds_value(hold_seconds)
+    set_transition_value(transition, transition_duration_ms)
+    startup.mark("config")
+
+    matrix = create_matrix(brightness)
+    offscreen = matrix.CreateFrameCanvas()
+    size = (matrix.width, matrix.height)
+    startup.mark("matrix")
+
+    snapshot = load_last_frame(*size)
+    if snapshot is not None:
+        offscreen = blit(matrix, offscreen, snapshot)
+        print(f"Showing last frame after {startup.first_pixel_ms:.0f} ms")
+    resume = load_resume_state()
+
+    cache_budget, gif_cache_budget = load_cache_config()
+    start_decoder()
+    workers = tiles.configure(VIEWER_CPU_CORES)
+    print(f"Matrix {matrix.width}x{matrix.height}, frame work split across {workers} core(s)")
+    decoded_cache = DecodedCache(cache_budget)
+    image_catalog = catalog.Catalog()
+    prefetcher = Prefetcher(size)
+    if WARMUP_CPU_CORES is not None:
+        warmup = warmup_pool.Warmup(WARMUP_CPU_CORES, size, gif_cache_budget)
+    planner = transitions.TransitionPlanner()
+    startup.mark("decoder")
+
+    open_control_socket()
+    threading.Thread(target=control_thread, daemon=True).start()
+    start_live_input(matrix.width, matrix.height)
+    open_preview(matrix.width, matrix.height)
+    threading.Thread(target=persist_thread, daemon=True).start()
+    startup.mark("control")
+
+    # Main display loop — lazy image loading
+
+    # current_paths: ordered list of image file paths
+    # current_data: decoded pixel data for the currently-displayed image (loaded on demand)
+    # current_img: the first frame (numpy array) of current_data, used for fade transitions
+    name = resume.get("playlist")
+    if isinstance(name, str) and name != CURRENT_PLAYLIST and os.path.isfile(bundle_path(name)):
+        playlist_name = name
+    current_paths, current_sigs = read_playlist(size)
+    startup.mark("playlist")
+    current_data_pixels = None
+    current_durations = None
+    current_img = None
+    idx = 0
+
+    # Resume where the previous run was; skip forward past broken images
+    # (the folder may be empty on first boot)
+    start = resume_index(current_paths, resume)
+    for k in range(len(current_paths)):
+        i = (start + k) % len(current_paths)
+        prefetcher.set_position(current_paths, i)
+        result = prefetcher.get(current_paths[i])
+        if result is not None:
+            current_data_pixels, current_durations = result
+            current_img = first_frame(current_data_pixels, current_durations)
+            idx = i
+            set_now_showing(current_paths, idx)
+            persist_position(current_paths, idx, current_img)
+            break
+    startup.mark("first_image")
 
-if current_img is None:
-    print(f"No images found in {IMAGE_FOLDER} — waiting for uploads via web UI...")
+    if current_img is None:
+        print(f"No images found in {IMAGE_FOLDER} — waiting for uploads via web UI...")
+    start_warmup(current_paths, idx)
 
-prev_running = False
+    prev_running = False
+    hold_started = None  # when the current image's hold began; survives reloads that don't affect it
 
-try:
-    print("Press CTRL-C to stop.")
-    print(f"Found {len(current_paths)} images")
-    print(f"Display is {'ON' if isRunning else 'OFF'}")
+    try:
+        print("Press CTRL-C to stop.")
+        print(f"Found {len(current_paths)} images")
+        print(f"Display is {'ON' if isRunning else 'OFF'}")
+
+        if isRunning and current_img is not None:
+            if snapshot is None:
+                print("Performing initial fade-in...")
+                offscreen = fade_in_from_black(matrix, offscreen, current_img)
+            elif not np.array_equal(snapshot, current_img):
+                offscreen = transition_to(matrix, offscreen, None, current_paths[idx],
+                                          snapshot, current_img)
+            prev_running = True
+        elif snapshot is not None:
+            clear_panel(matrix)
+        summary = startup.summary()
+        print(f"Startup: first pixel at {summary['first_pixel_ms']} ms, "
+              f"first image ready at {summary['steps']['first_image']} ms")
+
+        while True:
+            seen = state_version
+
+            # Live frames take over the panel until the producer goes quiet
+            if getIsRunning() and live_pending():
+                offscreen, last = show_live(matrix, offscreen)
+                if getIsRunning():
+                    if current_img is not None and last is not None:
+                        offscreen = transition_to(matrix, offscreen, None, current_paths[idx],
+                                                  last, current_img)
+                    elif current_img is None:
+                        clear_panel(matrix)
+                hold_started = None
+                continue
 
-    if isRunning and current_img is not None:
-        print("Performing initial fade-in...")
-        offscreen = fade_in_from_black(matrix, offscreen, current_img)
-        prev_running = True
+            # No images — wait for reload signal
+            if current_img is None:
+                if should_reload():
+                    new_paths, new_sigs = read_playlist((matrix.width, matrix.height))
+                    if new_paths:
+                        for i, p in enumerate(new_paths):
+                            prefetcher.set_position(new_paths, i)
+                            result = prefetcher.get(p)
+                            if result is not None:
+                                current_paths = new_paths
+                                current_sigs = new_sigs
+                                current_data_pixels, current_durations = result
+                                current_img = first_frame(current_data_pixels, current_durations)
+                                idx = i
+                                set_now_showing(current_paths, idx)
+                                persist_position(current_paths, idx, current_img)
+                                start_warmup(current_paths, idx)
+                                print(f"Loaded {len(current_paths)} images")
+                                if getIsRunning():
+                                    offscreen = fade_in_from_black(matrix, offscreen, current_img)
+                                    prev_running = True
+                                break
+                else:
+                    wait_for_state_change(seen)
+                continue
 
-    while True:
-        # No images — wait for reload signal
-        if current_img is None:
+            # Handle reload: diff against the current playlist and only
+            # transition if the image on screen was removed or changed
             if should_reload():
-                new_paths = get_sorted_image_paths(IMAGE_FOLDER)
-                if new_paths:
-                    for i, p in enumerate(new_paths):
-                        result = load_single_image(p, (matrix.width, matrix.height))
+                _, new_hold, new_transition, new_transition_ms = load_config()
+                set_hold_seconds_value(new_hold)
+                set_transition_value(new_transition, new_transition_ms)
+
+                new_paths, new_sigs = read_playlist((matrix.width, matrix.height))
+                diff = diff_playlist(current_paths, current_sigs, new_paths, new_sigs)
+                if not any(diff):
+                    print("Reload: playlist unchanged")
+                elif not new_paths:
+                    print("No images found after reload, keeping current state")
+                else:
+                    print(f"Reload: {len(diff.added)} added, {len(diff.removed)} removed, "
+                          f"{len(diff.modified)} modified{', reordered' if diff.reordered else ''}")
+                    if diff.removed or diff.modified:
+                        prefetcher.invalidate(diff.removed + diff.modified)
+                        # A prepared transition may hold the old pixels
+                        planner.clear()
+                        if active_bundle is None or not active_bundle.snapshot:
+                            removed = frame_cache.prune(new_paths, (matrix.width, matrix.height))
+                            if removed:
+                                print(f"Pruned {removed} stale frame cache entries")
+
+                    shown = current_paths[idx]
+                    new_idx = reload_position(current_paths, idx, new_paths)
+                    current_paths, current_sigs, idx = new_paths, new_sigs, new_idx
+                    prefetcher.set_position(current_paths, idx)
+                    set_now_showing(current_paths, idx)
+                    if diff.added or diff.modified:
+                        start_warmup(current_paths, idx)
+
+                    if current_paths[idx] != shown or shown in diff.modified:
+                        result = prefetcher.get(current_paths[idx])
                         if result is not None:
-                            current_paths = new_paths
-                            current_data_pixels, current_durations = result
-                            current_img = current_data_pixels[0] if current_durations is not None else current_data_pixels
-                            idx = i
-                            print(f"Loaded {len(current_paths)} images")
+                            new_pixels, new_durations = result
+                            new_img = first_frame(new_pixels, new_durations)
                             if getIsRunning():
-                                offscreen = fade_in_from_black(matrix, offscreen, current_img)
-                                prev_running = True
-                            break
-            else:
-                time.sleep(0.5)
-            continue
-
-        # Handle reload
-        if should_reload():
-            print("Reloading images...")
-            _, new_hold = load_config()
-            set_hold_seconds_value(new_hold)
-
-            new_paths = get_sorted_image_paths(IMAGE_FOLDER)
-            if new_paths:
-                current_paths = new_paths
-                idx = 0
-                result = load_single_image(current_paths[idx], (matrix.width, matrix.height))
-                if result is not None:
-                    new_pixels, new_durations = result
-                    new_img = new_pixels[0] if new_durations is not None else new_pixels
-                    print(f"Reloaded {len(current_paths)} images")
-                    if getIsRunning():
-                        offscreen = fade_out_to_black(matrix, offscreen, current_img)
-                        offscreen = fade_in_from_black(matrix, offscreen, new_img)
-                    current_data_pixels, current_durations = new_pixels, new_durations
-                    current_img = new_img
-            else:
-                print("No images found after reload, keeping current state")
+                                offscreen = transition_to(matrix, offscreen, None, current_paths[idx],
+                                                          current_img, new_img)
+                            current_data_pixels, current_durations = new_pixels, new_durations
+                            current_img = new_img
+                            hold_started = None
+                    persist_position(current_paths, idx, current_img)
 
-        now_running = getIsRunning()
+            now_running = getIsRunning()
 
-        # OFF transition
-        if prev_running and not now_running:
-            offscreen = fade_out_to_black(matrix, offscreen, current_img)
-            matrix.Clear()
+            # OFF transition
+            if prev_running and not now_running:
+                offscreen = fade_out_to_black(matrix, offscreen, current_img)
+                clear_panel(matrix)
 
-        # ON transition
-        if not prev_running and now_running:
-            offscreen = fade_in_from_black(matrix, offscreen, current_img)
+            # ON transition
+            if not prev_running and now_running:
+                offscreen = fade_in_from_black(matrix, offscreen, current_img)
+                hold_started = None
 
-        prev_running = now_running
+            prev_running = now_running
 
-        if now_running:
-            # Single image mode
-            if len(current_paths) == 1:
-                if current_durations is not None:
-                    offscreen, _ = show_gif(matrix, offscreen, current_data_pixels, current_durations, get_hold_seconds())
-                else:
-                    offscreen, _ = show_still(matrix, offscreen, current_img, 5)
-                continue
+            if now_running:
+                # Single image mode
+                if len(current_paths) == 1:
+                    if current_durations is not None:
+                        offscreen, _ = show_gif(matrix, offscreen, current_data_pixels, get_hold_seconds())
+                    else:
+                        offscreen, _ = show_still(matrix, offscreen, current_img, 5)
+                    take_nav()  # nothing to navigate to
+                    continue
 
-            # Multiple images: show current, then advance
-            if current_durations is not None:
-                offscreen, reload_triggered = show_gif(matrix, offscreen, current_data_pixels, current_durations, get_hold_seconds())
-            else:
-                offscreen, reload_triggered = show_still(matrix, offscreen, current_img, get_hold_seconds())
+                # Multiple images: render the transition to the next image in the
+                # background while the current one is held
+                upcoming = current_paths[(idx + 1) % len(current_paths)]
+                prepare_transition(current_paths[idx], upcoming, current_img,
+                                   lambda p=upcoming: next_transition_image(p))
 
-            if reload_triggered:
-                continue
+                if hold_started is None:
+                    hold_started = time.monotonic()
+                remaining = max(0.0, get_hold_seconds() - (time.monotonic() - hold_started))
+                if current_durations is not None:
+                    offscreen, interrupted = show_gif(matrix, offscreen, current_data_pixels, remaining)
+                else:
+                    offscreen, interrupted = show_still(matrix, offscreen, current_img, remaining)
 
-            # Advance to next image (lazy load)
-            if getIsRunning():
-                next_idx = (idx + 1) % len(current_paths)
-                result = load_single_image(current_paths[next_idx], (matrix.width, matrix.height))
-                if result is None:
-                    # Skip broken images
-                    print(f"Skipping broken image: {current_paths[next_idx]}")
-                    idx = next_idx
+                if interrupted and (peek_reload() or live_pending()):
                     continue
 
-                next_pixels, next_durations = result
-                next_img = next_pixels[0] if next_durations is not None else next_pixels
+                # Advance to next (or requested) image — normally already prefetched
+                if getIsRunning():
+                    hold_started = None
+                    next_idx = resolve_nav(take_nav(), idx, current_paths)
+                    if next_idx is None or next_idx == idx:
+                        continue
+                    result = prefetcher.get(current_paths[next_idx])
+                    if result is None:
+                        # Skip broken images
+                        print(f"Skipping broken image: {current_paths[next_idx]}")
+                        idx = next_idx
+                        prefetcher.set_position(current_paths, idx)
+                        set_now_showing(current_paths, idx)
+                        continue
+
+                    next_pixels, next_durations = result
+                    next_img = first_frame(next_pixels, next_durations)
+
+                    with transition_ms.time():
+                        offscreen = transition_to(matrix, offscreen, current_paths[idx],
+                                                  current_paths[next_idx], current_img, next_img)
+
+                    drift = clock.drift_report()
+                    if drift:
+                        print(f"Render clock: {drift}")
+
+                    # Drop our reference to the previous image (decoded_cache may keep it)
+                    current_data_pixels = next_pixels
+                    current_durations = next_durations
+                    current_img = next_img
+                    idx = next_idx
+                    prefetcher.set_position(current_paths, idx)
+                    set_now_showing(current_paths, idx)
+                    persist_position(current_paths, idx, current_img)
+            else:
+                wait_for_state_change(seen)
 
-                offscreen = fade_out_to_black(matrix, offscreen, current_img)
-                if BLACK_PAUSE_S > 0:
-                    time.sleep(BLACK_PAUSE_S)
-                offscreen = fade_in_from_black(matrix, offscreen, next_img)
-
-                # Free previous image data
-                current_data_pixels = next_pixels
-                current_durations = next_durations
-                current_img = next_img
-                idx = next_idx
-        else:
-            time.sleep(0.2)
-
-except KeyboardInterrupt:
-    pass
-finally:
-    matrix.Clear()
-    try:
-        os.unlink(CTRL_SOCK)
-    except OSError:
+    except KeyboardInterrupt:
         pass
-    print("Exiting...")
-    sys.exit(0)
+    finally:
+        flush_resume_state()
+        matrix.Clear()
+        if decoder is not None:
+            decoder.close()
+        for path in (CTRL_SOCK, LIVE_SOCK):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        print("Exiting...")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Background warm-up of the frame cache for the whole playlist.
+
+After boot or a reload that brings in new files, every playlist entry that
+is not in the frame cache yet is decoded by a pool of worker processes on
+cores the render loop doesn't use, in the order the entries will be shown.
+The viewer's own loads then hit the cache instead of waiting on a decode.
+
+The pool only exists while there is work, and the viewer never waits for
+it. A new run (e.g. another reload) cancels the queued part of the
+previous one. Entries the viewer's decoder is working on are skipped (see
+frame_cache.EntryLock).
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import frame_cache
+
+# Workers run at this niceness so the web server sharing their cores stays
+# responsive
+WARMUP_NICE = 10
+
+
+def _init_worker(cores):
+    if cores:
+        try:
+            os.sched_setaffinity(0, cores)
+        except (AttributeError, OSError):
+            pass
+    try:
+        os.nice(WARMUP_NICE)
+    except OSError:
+        pass
+
+
+def _warm(path, target_size, gif_budget):
+    """
+    Decode path into the frame cache. Returns True if it was decoded and
+    stored, False if it needs nothing (already cached, or being decoded by
+    the viewer right now) or can't be cached (empty, or an animation that
+    will be streamed). Raises on decode errors.
+    """
+    if frame_cache.is_cached(path, target_size):
+        return False
+    with frame_cache.EntryLock(path, target_size) as owner:
+        # Not owner: the viewer's decoder has it in flight and stores it
+        if not owner or frame_cache.is_cached(path, target_size):
+            return False
+        try:
+            result = frame_cache.decode_image(path, target_size, gif_budget)
+        except frame_cache.OverBudget:
+            return False
+        if result is None:
+            return False
+        return frame_cache.store(path, target_size, *result)
+
+
+class Warmup:
+    def __init__(self, cores, target_size, gif_budget=None):
+        self.cores = list(cores or ())
+        self.target_size = tuple(target_size)
+        self.gif_budget = gif_budget
+        self._lock = threading.Lock()
+        self._gen = 0
+        self._progress = {"state": "idle", "total": 0, "done": 0, "decoded": 0, "failed": 0}
+
+    def _workers(self):
+        return max(1, min(len(self.cores) or 1, os.cpu_count() or 1))
+
+    def start(self, paths):
+        """Warm paths, in the given order, in the background; replaces any run in progress."""
+        with self._lock:
+            self._gen += 1
+            gen = self._gen
+            self._progress = {"state": "running", "total": len(paths), "done": 0,
+                              "decoded": 0, "failed": 0}
+        threading.Thread(target=self._run, args=(gen, list(paths)), daemon=True).start()
+
+    def _update(self, gen, **changes):
+        """Apply changes to the progress of run gen. Returns False if gen was superseded."""
+        with self._lock:
+            if gen != self._gen:
+                return False
+            for key, value in changes.items():
+                if key in ("done", "decoded", "failed"):
+                    self._progress[key] += value
+                else:
+                    self._progress[key] = value
+            return True
+
+    def _run(self, gen, paths):
+        started = time.monotonic()
+        pending = [p for p in paths if not frame_cache.is_cached(p, self.target_size)]
+        if not self._update(gen, done=len(paths) - len(pending)):
+            return
+        if pending:
+            try:
+                os.makedirs(frame_cache.FRAME_CACHE_DIR, exist_ok=True)
+            except OSError:
+                pass
+            if not os.access(frame_cache.FRAME_CACHE_DIR, os.W_OK):
+                print(f"Warm-up skipped: {frame_cache.FRAME_CACHE_DIR} is not writable")
+                self._update(gen, state="unavailable")
+                return
+            print(f"Warm-up: decoding {len(pending)} of {len(paths)} images on {self._workers()} worker(s)")
+            pool = ProcessPoolExecutor(self._workers(), mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(self.cores,))
+            try:
+                # Workers take jobs first-in first-out, i.e. in display order
+                futures = {pool.submit(_warm, p, self.target_size, self.gif_budget): p for p in pending}
+                for future in as_completed(futures):
+                    try:
+                        decoded = future.result()
+                        ok = self._update(gen, done=1, decoded=int(decoded))
+                    except Exception as e:
+                        print(f"Warm-up: skipping {futures[future]}: {e}")
+                        ok = self._update(gen, done=1, failed=1)
+                    if not ok:
+                        return
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+        elapsed = time.monotonic() - started
+        if self._update(gen, state="done", elapsed_s=round(elapsed, 1)) and pending:
+            print(f"Warm-up finished in {elapsed:.1f}s")
+
+    def progress(self):
+        with self._lock:
+            return dict(self._progress)
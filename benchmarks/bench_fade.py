@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-step cost of a perceptual fade.
+
+Compares the original per-step pipeline (linear gather, uint16 widen,
+multiply/shift, cast, gamma gather) against the lookup-table engine in
+backend/fade.py, on a single 64x64 panel and on larger chained geometries.
+
+Usage: python3 benchmarks/bench_fade.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fade import (  # noqa: E402
+    _TO_GAMMA, _TO_LINEAR, fade_buffer, scale_perceptual, scale_perceptual_into, smoothstep,
+)
+
+# (label, height, width)
+GEOMETRIES = [
+    ("64x64 (1 panel)", 64, 64),
+    ("64x256 (4 chained)", 64, 256),
+    ("192x256 (4 chained x 3 parallel)", 192, 256),
+]
+
+STEPS = 40
+
+
+def legacy_scale_perceptual(img_u8, scale01):
+    """The pre-LUT implementation, kept here as the baseline."""
+    lin = _TO_LINEAR[img_u8]
+    s = int(scale01 * 256 + 0.5)
+    out = (lin.astype(np.uint16) * s) >> 8
+    return _TO_GAMMA[out.astype(np.uint8)]
+
+
+def levels():
+    return [smoothstep(i / float(STEPS)) for i in range(STEPS + 1)]
+
+
+def time_fade(step_fn, repeat):
+    """Return mean seconds per fade step over `repeat` full fades."""
+    lv = levels()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for level in lv:
+            step_fn(level)
+    return (time.perf_counter() - start) / (repeat * len(lv))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50, help="full fades per measurement")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'geometry':<34} {'legacy us/step':>15} {'lut us/step':>12} {'speedup':>8}")
+    for label, h, w in GEOMETRIES:
+        img = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+
+        # Correctness: both paths must produce identical frames
+        for level in levels():
+            assert np.array_equal(legacy_scale_perceptual(img, level), scale_perceptual(img, level))
+
+        out = fade_buffer(img.shape)
+        legacy = time_fade(lambda lv: legacy_scale_perceptual(img, lv), args.repeat)
+        lut = time_fade(lambda lv: scale_perceptual_into(img, lv, out), args.repeat)
+        print(f"{label:<34} {legacy * 1e6:>15.1f} {lut * 1e6:>12.1f} {legacy / lut:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Viewer pipeline benchmark over the sample images in matrix_images/.
+
+Runs the viewer's hot paths against a simulated matrix (see
+backend/matrix_backend.py) at one or more panel geometries:
+
+  decode_cold       frame_cache.decode_image() per image, no cache
+  decode_jpeg       decode_image() of the JPEGs only, against a full-resolution
+                    decode (DECODE_REDUCING_GAP None); also reports the largest
+                    decoded pixel buffer each way
+  load_cold         viewer.load_single_image() with an empty frame cache
+  load_cached       viewer.load_single_image() on a warm frame cache
+  scale_perceptual  one fade step (fade.scale_perceptual_into)
+  blit              viewer.blit() of a changed frame (unpaced)
+  fade_to_level     one full viewer fade at FADE_FPS (wall time; late and
+                    dropped frames are counted by a private FrameClock)
+  playlist_cycle    one pass over the playlist: cached load, crossfade
+                    render, blit of every transition and GIF frame (unpaced)
+
+Each stage reports latency percentiles in ms, throughput in ops/s and the
+process peak RSS after the stage. Results can be written as JSON and
+compared against a stored baseline; --compare exits 1 on regressions.
+
+The frame cache lives in a temporary directory, so runs never touch the
+real cache. If the image folder has no animated GIF, one is synthesised
+from the first still so GIF paths are always exercised.
+
+Usage:
+  python3 benchmarks/bench_viewer.py [--geometry 64x64 --geometry 256x64 ...]
+      [--repeat N] [--json out.json] [--compare baseline.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import frame_cache  # noqa: E402
+import matrix_backend  # noqa: E402
+import tiles  # noqa: E402
+import transitions  # noqa: E402
+import viewer  # noqa: E402
+from config import IMAGE_FOLDER, get_sorted_image_paths  # noqa: E402
+from fade import fade_buffer, scale_perceptual_into, smoothstep  # noqa: E402
+from frame_clock import FrameClock  # noqa: E402
+from metrics import Histogram  # noqa: E402
+
+# Width x height; 256x64 is 4 panels chained, 256x192 adds 3 parallel chains
+DEFAULT_GEOMETRIES = ["64x64", "256x64", "256x192"]
+
+STAGES = ("decode_cold", "decode_jpeg", "load_cold", "load_cached", "scale_perceptual",
+          "blit", "fade_to_level", "playlist_cycle")
+
+# Stages whose samples are paced by the render clock, not compute bound
+PACED_STAGES = ("fade_to_level",)
+
+# Fraction by which a stage's p50 may exceed the baseline before it is flagged
+DEFAULT_THRESHOLD = 0.20
+
+# Effectively unpaced SwapOnVSync for the simulator
+UNPACED_HZ = 1e9
+
+SYNTH_GIF_FRAMES = 24
+SYNTH_GIF_FRAME_MS = 50
+
+
+def parse_geometry(text):
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+
+def playlist(folder, scratch):
+    """Sorted image paths in folder, plus a synthesised GIF if there is none."""
+    paths = get_sorted_image_paths(folder)
+    if paths and not any(p.lower().endswith(".gif") for p in paths):
+        with Image.open(paths[0]) as src:
+            base = src.convert("RGB").resize((128, 128))
+        arr = np.asarray(base)
+        frames = [Image.fromarray(np.roll(arr, i * 128 // SYNTH_GIF_FRAMES, axis=1))
+                  for i in range(SYNTH_GIF_FRAMES)]
+        gif = os.path.join(scratch, "synthetic.gif")
+        frames[0].save(gif, save_all=True, append_images=frames[1:],
+                       duration=SYNTH_GIF_FRAME_MS, loop=0)
+        paths.append(gif)
+    return paths
+
+
+def reset_cache(cache_dir):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir)
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def decoded_kb(path, size):
+    """Size of the pixel buffer the decoder allocates for path (after draft scaling)."""
+    with Image.open(path) as img:
+        frame_cache._draft(img, size)
+        w, h = img.size
+        return w * h * len(img.getbands()) // 1024
+
+
+def summarize(hist, elapsed_s):
+    result = hist.summary()
+    result["ops_per_s"] = round(result["count"] / elapsed_s, 2) if elapsed_s > 0 else 0.0
+    return result
+
+
+class StageRunner:
+    def __init__(self, paths, size, repeat, cache_dir):
+        self.paths = paths
+        self.size = size
+        self.repeat = repeat
+        self.cache_dir = cache_dir
+        self.matrix = matrix_backend.SimMatrix(size[1], size[0], 1, 1, 100, refresh_hz=UNPACED_HZ)
+        self.off = self.matrix.CreateFrameCanvas()
+        self.sample = np.random.default_rng(0).integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+
+    def run(self, stage):
+        self.hist = Histogram(window=1 << 16)
+        self.elapsed = 0.0
+        extra = getattr(self, stage)()
+        result = summarize(self.hist, self.elapsed)
+        result.update(extra or {})
+        result["peak_rss_kb"] = peak_rss_kb()
+        return result
+
+    def _sample(self, fn, *args):
+        """Time one call of fn into the stage histogram and return its result."""
+        start = time.perf_counter()
+        result = fn(*args)
+        ms = (time.perf_counter() - start) * 1000.0
+        self.hist.add(ms)
+        self.elapsed += ms / 1000.0
+        return result
+
+    def decode_cold(self):
+        for _ in range(self.repeat):
+            for path in self.paths:
+                self._sample(frame_cache.decode_image, path, self.size)
+
+    def decode_jpeg(self):
+        jpegs = [p for p in self.paths if p.lower().endswith((".jpg", ".jpeg"))]
+        if not jpegs:
+            return {}
+        saved = frame_cache.DECODE_REDUCING_GAP
+        full = Histogram(window=1 << 16)
+        try:
+            frame_cache.DECODE_REDUCING_GAP = None
+            full_kb = max(decoded_kb(p, self.size) for p in jpegs)
+            for _ in range(self.repeat):
+                for path in jpegs:
+                    with full.time():
+                        frame_cache.decode_image(path, self.size)
+        finally:
+            frame_cache.DECODE_REDUCING_GAP = saved
+        reduced_kb = max(decoded_kb(p, self.size) for p in jpegs)
+        for _ in range(self.repeat):
+            for path in jpegs:
+                self._sample(frame_cache.decode_image, path, self.size)
+        return {"images": len(jpegs), "full_p50": full.summary()["p50"],
+                "decoded_kb": reduced_kb, "full_decoded_kb": full_kb}
+
+    def load_cold(self):
+        for _ in range(self.repeat):
+            reset_cache(self.cache_dir)
+            for path in self.paths:
+                viewer.release(self._sample(viewer.load_single_image, path, self.size))
+
+    def load_cached(self):
+        for path in self.paths:
+            frame_cache.get_or_decode(path, self.size)
+        for _ in range(self.repeat):
+            for path in self.paths:
+                viewer.release(self._sample(viewer.load_single_image, path, self.size))
+
+    def scale_perceptual(self):
+        out = fade_buffer(self.sample.shape)
+        steps = viewer.FADE_STEPS
+        levels = [smoothstep(i / float(steps)) for i in range(steps + 1)]
+        for _ in range(self.repeat * 10):
+            for level in levels:
+                self._sample(scale_perceptual_into, self.sample, level, out)
+
+    def blit(self):
+        frames = (self.sample, 255 - self.sample)
+        viewer.invalidate_blit()
+        for i in range(viewer.FADE_STEPS * self.repeat * 10):
+            self.off = self._sample(viewer.blit, self.matrix, self.off, frames[i & 1])
+
+    def fade_to_level(self):
+        saved = viewer.clock
+        viewer.clock = FrameClock()
+        viewer.invalidate_blit()
+        try:
+            for _ in range(self.repeat):
+                self.off = self._sample(viewer.fade_to_level, self.matrix, self.off, self.sample, 1.0, 0.0)
+            stats = viewer.clock.stats()
+        finally:
+            viewer.clock = saved
+        nominal_ms = 1000.0 * viewer.FADE_STEPS / viewer.FADE_FPS
+        return {"nominal_ms": round(nominal_ms, 3), "late_frames": stats["late"],
+                "dropped_frames": stats["dropped"]}
+
+    def playlist_cycle(self):
+        for path in self.paths:
+            frame_cache.get_or_decode(path, self.size)
+        steps = max(1, int(round(viewer.DEFAULT_TRANSITION_DURATION_MS / 1000.0 * viewer.FADE_FPS)))
+        blits = {"n": 0}
+
+        def cycle():
+            prev = None
+            for path in self.paths:
+                result = viewer.load_single_image(path, self.size)
+                if result is None:
+                    continue
+                pixels, durations = result
+                img = viewer.first_frame(pixels, durations)
+                if prev is not None:
+                    for frame in transitions.render_transition("crossfade", prev, img, steps):
+                        self.off = viewer.blit(self.matrix, self.off, frame)
+                        blits["n"] += 1
+                if durations is not None:
+                    player = pixels.play()
+                    for _ in range(len(durations)):
+                        frame, _ = next(player)
+                        self.off = viewer.blit(self.matrix, self.off, frame)
+                        blits["n"] += 1
+                viewer.release(result)
+                prev = img
+
+        for _ in range(self.repeat):
+            self._sample(cycle)
+        return {"images": len(self.paths), "blits_per_cycle": blits["n"] // max(1, self.repeat)}
+
+
+def run(args):
+    scratch = tempfile.mkdtemp(prefix="bench_viewer_")
+    cache_dir = os.path.join(scratch, "frames")
+    frame_cache.FRAME_CACHE_DIR = cache_dir
+    try:
+        paths = playlist(args.images, scratch)
+        if not paths:
+            sys.exit(f"No images in {args.images}")
+        stages = args.stage or list(STAGES)
+        results = {}
+        for geometry in args.geometry or DEFAULT_GEOMETRIES:
+            size = parse_geometry(geometry)
+            reset_cache(cache_dir)
+            runner = StageRunner(paths, size, args.repeat, cache_dir)
+            results[geometry] = {}
+            for stage in stages:
+                results[geometry][stage] = runner.run(stage)
+                print_row(geometry, stage, results[geometry][stage])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": Image.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "tile_workers": args.cores,
+            "images": [os.path.basename(p) for p in paths],
+        },
+        "results": results,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def print_row(geometry, stage, r):
+    if r.get("window"):
+        print(f"{geometry:<8} {stage:<17} {r['p50']:>9.3f} {r['p90']:>9.3f} {r['p99']:>9.3f} "
+              f"{r['ops_per_s']:>10.1f} {r['peak_rss_kb'] / 1024.0:>8.1f}")
+    else:
+        print(f"{geometry:<8} {stage:<17} {'-':>9} {'-':>9} {'-':>9} {'-':>10} {'-':>8}")
+
+
+def compare(current, baseline, threshold):
+    """Print p50 changes against baseline and return the list of regressions."""
+    regressions = []
+    print(f"\n{'geometry':<8} {'stage':<17} {'base p50':>9} {'now p50':>9} {'change':>8}")
+    for geometry, stages in current["results"].items():
+        for stage, r in stages.items():
+            base = baseline.get("results", {}).get(geometry, {}).get(stage)
+            if not base or not base.get("p50") or not r.get("p50"):
+                continue
+            change = r["p50"] / base["p50"] - 1.0
+            flag = ""
+            if change > threshold and stage not in PACED_STAGES:
+                flag = "  REGRESSION"
+                regressions.append((geometry, stage, change))
+            elif stage in PACED_STAGES and r.get("dropped_frames", 0) > base.get("dropped_frames", 0):
+                flag = "  REGRESSION (dropped frames)"
+                regressions.append((geometry, stage, change))
+            print(f"{geometry:<8} {stage:<17} {base['p50']:>9.3f} {r['p50']:>9.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", default=IMAGE_FOLDER, help="image folder (default: %(default)s)")
+    parser.add_argument("--geometry", action="append", help="WxH, repeatable (default: %s)"
+                        % ", ".join(DEFAULT_GEOMETRIES))
+    parser.add_argument("--stage", action="append", choices=STAGES, help="run only these stages")
+    parser.add_argument("--repeat", type=int, default=5, help="passes per stage")
+    parser.add_argument("--cores", type=int, default=len(viewer.VIEWER_CPU_CORES),
+                        help="threads for tiled frame work (default: %(default)s, capped at usable CPUs)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed p50 slowdown before flagging (default: %(default)s)")
+    args = parser.parse_args()
+
+    print(f"{'geometry':<8} {'stage':<17} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+          f"{'ops/s':>10} {'rss MB':>8}")
+    args.cores = tiles.configure(range(args.cores))
+    report = run(args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import { Label } from './components/ui/label';
 import { Slider } from './components/ui/slider';
 import { ConfirmDialog } from './components/ui/dialog';
 import { PulseLoader } from "react-spinners";
+import { LivePreview } from './LivePreview';
 
 // Use relative URL when served from same server, or specify full URL for development
 export const SERVER_URL = import.meta.env.DEV
@@ -644,6 +645,9 @@ function MainApp({ token, onLogout }: { token: string, onLogout: () => void }) {
           <Button onClick={handleTurnOff}>Turn off</Button>
         </div>
 
+        {/* What the panel is showing right now */}
+        <LivePreview token={token} />
+
         {/* Schedule */}
         <div className="grid w-full items-center gap-3 p-3 bg-gray-800 rounded-lg">
           <div className="flex items-center justify-between">
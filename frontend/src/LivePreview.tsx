@@ -0,0 +1,129 @@
+import { useEffect, useRef, useState } from "react";
+import { Button } from "./components/ui/button";
+import { SERVER_URL } from "./App";
+
+const RETRY_MS = 3000
+
+// Message header of /api/preview/stream (see backend/preview.py):
+// "LEDP", u8 type, u8 reserved, u16 width, u16 height, u32 seq, u32 length
+const HEADER_BYTES = 18
+const KEY = 0
+const DELTA = 1
+
+async function inflate(data: Uint8Array): Promise<Uint8Array> {
+  const stream = new Blob([data]).stream().pipeThrough(new DecompressionStream("deflate"))
+  return new Uint8Array(await new Response(stream).arrayBuffer())
+}
+
+function concat(a: Uint8Array, b: Uint8Array): Uint8Array {
+  const out = new Uint8Array(a.length + b.length)
+  out.set(a)
+  out.set(b, a.length)
+  return out
+}
+
+// Reads the preview stream until it ends, drawing every frame to canvas.
+// Returns whether any frame arrived.
+async function play(token: string, canvas: HTMLCanvasElement, signal: AbortSignal): Promise<boolean> {
+  const response = await fetch(`${SERVER_URL}/api/preview/stream`, {
+    headers: { 'Authorization': `Bearer ${token}` },
+    signal,
+  })
+  if (!response.ok || !response.body) return false
+  const reader = response.body.getReader()
+  let buf = new Uint8Array(0)
+  let frame: Uint8Array | null = null
+  let image: ImageData | null = null
+  let drew = false
+
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) return drew
+    buf = concat(buf, value)
+
+    while (buf.length >= HEADER_BYTES) {
+      const view = new DataView(buf.buffer, buf.byteOffset, buf.length)
+      const kind = view.getUint8(4)
+      const width = view.getUint16(6)
+      const height = view.getUint16(8)
+      const length = view.getUint32(14)
+      if (buf.length < HEADER_BYTES + length) break
+      const payload = buf.slice(HEADER_BYTES, HEADER_BYTES + length)
+      buf = buf.slice(HEADER_BYTES + length)
+      if (kind !== KEY && kind !== DELTA) continue  // heartbeat
+
+      const pixels = await inflate(payload)
+      if (kind === KEY || !frame) {
+        frame = pixels
+      } else {
+        // Deltas are byte-wise differences modulo 256
+        for (let i = 0; i < frame.length; i++) frame[i] = (frame[i] + pixels[i]) & 0xff
+      }
+      if (!image || image.width !== width || image.height !== height) {
+        canvas.width = width
+        canvas.height = height
+        image = new ImageData(width, height)
+      }
+      for (let p = 0, q = 0; p < frame.length; p += 3, q += 4) {
+        image.data[q] = frame[p]
+        image.data[q + 1] = frame[p + 1]
+        image.data[q + 2] = frame[p + 2]
+        image.data[q + 3] = 255
+      }
+      canvas.getContext("2d")?.putImageData(image, 0, 0)
+      drew = true
+    }
+  }
+}
+
+// Shows what the panel is showing. The server ends each stream after a
+// while (sooner when the viewer isn't running); it is reopened right away
+// after frames arrived, otherwise after RETRY_MS
+export function LivePreview({ token }: { token: string }) {
+  const [open, setOpen] = useState(false)
+  const [error, setError] = useState(false)
+  const canvasRef = useRef<HTMLCanvasElement>(null)
+
+  useEffect(() => {
+    if (!open) return
+    const controller = new AbortController()
+    let timer: ReturnType<typeof setTimeout> | undefined
+
+    async function run() {
+      let drew = false
+      try {
+        if (canvasRef.current) drew = await play(token, canvasRef.current, controller.signal)
+      } catch {
+        drew = false
+      }
+      if (controller.signal.aborted) return
+      setError(!drew)
+      timer = setTimeout(run, drew ? 0 : RETRY_MS)
+    }
+    run()
+
+    return () => {
+      controller.abort()
+      clearTimeout(timer)
+    }
+  }, [open, token])
+
+  return (
+    <div className="grid w-full gap-3 p-3 bg-gray-800 rounded-lg">
+      <Button variant="outline" size="sm" onClick={() => { setOpen(!open); setError(false) }}>
+        {open ? "Hide live preview" : "Show live preview"}
+      </Button>
+      {open && (
+        <>
+          {error && <p className="text-sm text-gray-400 text-center">Preview unavailable, retrying...</p>}
+          <canvas
+            ref={canvasRef}
+            aria-label="Live panel preview"
+            className="w-full bg-black rounded"
+            style={{ imageRendering: "pixelated", display: error ? "none" : undefined }}
+          />
+        </>
+      )}
+    </div>
+  )
+}
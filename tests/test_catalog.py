@@ -0,0 +1,77 @@
+"""Tests for backend/catalog.py."""
+
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from catalog import Catalog  # noqa: E402
+
+
+def _make_folder(tmp_path, count=3):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(count):
+        frames = [Image.new("RGB", (16, 8), (i * 40, j * 40, 0)) for j in range(3)]
+        frames[0].save(folder / f"img{i}.gif", save_all=True, append_images=frames[1:], duration=70)
+    return folder
+
+
+def _wait_described(cat, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        rows = cat.describe()
+        if all(row["sha1"] for row in rows):
+            return rows
+        time.sleep(0.02)
+    return cat.describe()
+
+
+def test_describing_catalog_fills_in_rows_synced_by_another(tmp_path):
+    folder = _make_folder(tmp_path)
+    db = str(tmp_path / "catalog.db")
+    order = str(folder / "order.json")
+
+    # The viewer starts first and syncs without describing
+    viewer_side = Catalog(db, str(folder), order)
+    assert len(viewer_side.filenames()) == 3
+    assert all(row["sha1"] is None for row in viewer_side.describe())
+
+    # The server's sync finds nothing changed but must still fill them in
+    server_side = Catalog(db, str(folder), order, describe=True)
+    server_side.refresh(force=True)
+    rows = _wait_described(server_side)
+    assert [row["filename"] for row in rows] == ["img0.gif", "img1.gif", "img2.gif"]
+    for row in rows:
+        assert row["sha1"]
+        assert (row["width"], row["height"], row["frames"]) == (16, 8, 3)
+        assert row["durations"] == [70, 70, 70]
+
+
+def test_describe_pending_drops_results_for_changed_files(tmp_path):
+    folder = _make_folder(tmp_path, count=1)
+    cat = Catalog(str(tmp_path / "catalog.db"), str(folder), str(folder / "order.json"))
+    cat.filenames()
+    etag = cat.etag()
+
+    # Replaced after the sync, with a different size: the row no longer matches
+    Image.new("RGB", (4, 4)).save(folder / "img0.gif")
+    assert cat.describe_pending() == 0
+    assert cat.etag() == etag
+
+    cat.refresh(force=True)
+    assert cat.describe_pending() == 1
+    assert cat.describe()[0]["width"] == 4
+
+
+def test_fallback_uses_own_order_file(tmp_path):
+    folder = _make_folder(tmp_path)
+    order = tmp_path / "order.json"
+    order.write_text('["img2.gif", "img0.gif"]')
+    # A directory can't be opened as a database
+    cat = Catalog(str(tmp_path), str(folder), str(order))
+    assert not cat.available
+    assert cat.filenames() == ["img2.gif", "img0.gif", "img1.gif"]